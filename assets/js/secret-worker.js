@@ -0,0 +1,52 @@
+// Decrypts secret spans for layouts/partials/extend_footer.html off the main
+// thread. The session key is wrapped with RSA PKCS#1 v1.5, which WebCrypto
+// does not offer, so it is unwrapped with JSEncrypt; spans use WebCrypto's AES-CBC.
+self.window = self; // JSEncrypt looks for a window global.
+importScripts('https://cdnjs.cloudflare.com/ajax/libs/jsencrypt/3.3.2/jsencrypt.min.js');
+
+const aesKeys = new Map();
+
+function decodeBase64(text) {
+    return Uint8Array.from(atob(text), c => c.charCodeAt(0));
+}
+
+function importAesKey(sessionKey) {
+    if (!aesKeys.has(sessionKey)) {
+        aesKeys.set(sessionKey, crypto.subtle.importKey('raw', decodeBase64(sessionKey), 'AES-CBC', false, ['decrypt']));
+    }
+    return aesKeys.get(sessionKey);
+}
+
+const tasks = {
+    // Returns the base64 session key wrapped in encryptedSessionKey.
+    unwrap: function (data) {
+        const decrypt = new JSEncrypt();
+        decrypt.setPrivateKey(data.privateKey);
+        const sessionKey = decrypt.decrypt(data.encryptedSessionKey);
+        if (!sessionKey) {
+            throw new Error("解密会话密钥失败。请检查你的RSA私钥。");
+        }
+        return sessionKey;
+    },
+    // Returns the UTF-8 plaintext of one AES-CBC (PKCS#7) ciphertext.
+    decrypt: async function (data) {
+        try {
+            const key = await importAesKey(data.sessionKey);
+            const plaintext = await crypto.subtle.decrypt(
+                { name: 'AES-CBC', iv: decodeBase64(data.iv) }, key, decodeBase64(data.ciphertext)
+            );
+            return new TextDecoder('utf-8', { fatal: true }).decode(plaintext);
+        } catch (error) {
+            throw new Error("AES解密数据失败。");
+        }
+    }
+};
+
+self.onmessage = async function (event) {
+    const { id, type, data } = event.data;
+    try {
+        self.postMessage({ id: id, result: await tasks[type](data) });
+    } catch (error) {
+        self.postMessage({ id: id, error: error.message || String(error) });
+    }
+};
@@ -0,0 +1,116 @@
+// Search over the sharded inverted index that blog-uploader writes to
+// static/search/. Only the shards holding the query's terms are fetched.
+// The tokenizer must stay in sync with tokenize_search_text in blog_uploader.
+(function () {
+    const box = document.getElementById('searchbox');
+    const input = document.getElementById('searchInput');
+    const resultList = document.getElementById('searchResults');
+    const base = box.dataset.index;
+    const SHARD_SPAN = 256;
+    const RESULT_LIMIT = 20;
+    const WORD = /[\p{L}\p{N}]+/gu;
+    const CJK = /([\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af]+)/;
+
+    function tokenize(text) {
+        const terms = [];
+        for (const word of text.normalize('NFKC').toLowerCase().match(WORD) || []) {
+            word.split(CJK).forEach(function (part, i) {
+                if (i % 2 === 0) {
+                    if (part.length > 1) terms.push(part);
+                } else if (part.length === 1) {
+                    terms.push(part);
+                } else {
+                    for (let j = 0; j < part.length - 1; j++) terms.push(part.slice(j, j + 2));
+                }
+            });
+        }
+        return terms;
+    }
+
+    function shardFor(term) {
+        const cp = term.codePointAt(0);
+        return cp < 128 ? term[0] : 'u' + Math.floor(cp / SHARD_SPAN).toString(16);
+    }
+
+    function loadJSON(url) {
+        return fetch(url).then(function (r) { return r.ok ? r.json() : {}; }).catch(function () { return {}; });
+    }
+
+    const shards = {};
+    function loadShard(id) {
+        if (!(id in shards)) shards[id] = loadJSON(base + 'shards/' + id + '.json');
+        return shards[id];
+    }
+    const docsReady = loadJSON(base + 'docs.json').then(function (table) { return table.docs || {}; });
+
+    async function search(query) {
+        const terms = [...new Set(tokenize(query))];
+        if (!terms.length) return [];
+        // The last word may still be typed, and a lone CJK character only
+        // exists as the start of bigrams, so those match as prefixes.
+        const last = terms[terms.length - 1];
+        const prefix = !/\s$/.test(query) && (!CJK.test(last) || last.length === 1) ? last : null;
+        const [docs, ...postingsByTerm] = await Promise.all(
+            [docsReady].concat(terms.map(function (term) { return loadShard(shardFor(term)); })));
+
+        let scores = null;
+        terms.forEach(function (term, i) {
+            const postings = postingsByTerm[i];
+            const keys = term === prefix
+                ? Object.keys(postings).filter(function (key) { return key.startsWith(term); })
+                : (Object.prototype.hasOwnProperty.call(postings, term) ? [term] : []);
+            const matched = new Map();
+            for (const key of keys) {
+                // Postings are flat [doc, weight, doc, weight, ...] lists.
+                const list = postings[key];
+                for (let j = 0; j < list.length; j += 2) {
+                    matched.set(list[j], Math.max(matched.get(list[j]) || 0, list[j + 1]));
+                }
+            }
+            // Every term has to match; the weights add up to the score.
+            if (scores === null) {
+                scores = matched;
+            } else {
+                for (const [doc, score] of scores) {
+                    if (matched.has(doc)) scores.set(doc, score + matched.get(doc));
+                    else scores.delete(doc);
+                }
+            }
+        });
+        return [...scores]
+            .sort(function (a, b) { return b[1] - a[1]; })
+            .map(function (entry) { return docs[entry[0]]; })
+            .filter(Boolean)
+            .slice(0, RESULT_LIMIT);
+    }
+
+    function escapeHTML(text) {
+        const div = document.createElement('div');
+        div.textContent = text;
+        return div.innerHTML;
+    }
+
+    let latest = 0;
+    input.addEventListener('input', async function () {
+        const query = this.value;
+        const ticket = ++latest;
+        const results = await search(query);
+        // A slower, older query must not overwrite the results of a newer one.
+        if (ticket !== latest) return;
+        resultList.innerHTML = results.map(function (doc) {
+            return `<li class="post-entry"><header class="entry-header">${escapeHTML(doc.title)}&nbsp;»</header>` +
+                `<div class="entry-content"><p>${escapeHTML(doc.summary)}</p></div>` +
+                `<footer class="entry-footer">${escapeHTML(doc.date)}</footer>` +
+                `<a href="${encodeURI(doc.url)}" aria-label="${escapeHTML(doc.title)}"></a></li>`;
+        }).join('');
+    });
+
+    input.addEventListener('keydown', function (e) {
+        if (e.key === 'Escape') {
+            this.value = '';
+            resultList.innerHTML = '';
+        } else if (e.key === 'Enter' && resultList.firstChild) {
+            resultList.firstChild.querySelector('a').click();
+        }
+    });
+})();
@@ -0,0 +1,323 @@
+"""
+Benchmarks for the uploader's hot paths on a synthetic Hugo site.
+
+Run it from a checkout with:
+
+    python -m blog_uploader.benchmark --posts 500 --images 4 --secrets 3 --output results.json
+    python -m blog_uploader.benchmark --baseline results.json
+
+Everything runs inside a temporary HOME, against the built-in PicGo-compatible
+image server, a stand-in for linked sites and a local bare git remote, so no real
+repository is touched.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import statistics
+import subprocess
+import tempfile
+import click
+
+SAMPLE_POST = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "..", "..", "content", "post", "基准测试文件", "index.md"
+)
+FALLBACK_BODY = "这是一段用于基准测试的正文。The quick brown fox jumps over the lazy dog.\n\n" * 40
+# Smallest valid PNG (1x1, transparent); every generated image gets a unique suffix so hashes differ.
+PNG_BYTES = bytes.fromhex(
+    "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+    "1f15c4890000000d49444154789c6300010000050001"
+    "0d0a2db40000000049454e44ae426082"
+)
+
+# --- Synthetic Site ---
+
+def load_sample_body():
+    """Returns the body of the repo's benchmark post, or generated text outside a checkout."""
+    if os.path.exists(SAMPLE_POST):
+        with open(SAMPLE_POST, 'r', encoding='utf-8') as f:
+            text = f.read()
+        parts = text.split('---', 2)
+        return parts[2] if len(parts) == 3 else text
+    return FALLBACK_BODY
+
+def generate_post_source(index, images, secrets, body, image_dir):
+    """Writes the images of one synthetic post and returns its markdown source."""
+    lines = [body]
+    for i in range(images):
+        image_path = os.path.join(image_dir, f"post-{index}-{i}.png")
+        with open(image_path, 'wb') as f:
+            f.write(PNG_BYTES + f"{index}-{i}".encode())
+        lines.append(f"![图片 {i}](images/post-{index}-{i}.png)\n")
+    for i in range(secrets):
+        lines.append(f"这里有一段秘密内容 ~~secret {index}-{i}: token-{index * 1000 + i}~~ 结束。\n")
+    return "\n".join(lines)
+
+def generate_site(root, posts, images, secrets):
+    """
+    Generates a Hugo-like tree with `posts` posts under root/site and their
+    sources (with `images` images and `secrets` spans each) under root/notes.
+    """
+    body = load_sample_body()
+    site_dir = os.path.join(root, "site")
+    notes_dir = os.path.join(root, "notes")
+    image_dir = os.path.join(notes_dir, "images")
+    os.makedirs(image_dir, exist_ok=True)
+
+    sources = []
+    for index in range(posts):
+        source = generate_post_source(index, images, secrets, body, image_dir)
+        source_path = os.path.join(notes_dir, f"post-{index}.md")
+        with open(source_path, 'w', encoding='utf-8') as f:
+            f.write(source)
+        sources.append(source_path)
+
+        post_dir = os.path.join(site_dir, "content", "post", f"post-{index}")
+        os.makedirs(post_dir)
+        with open(os.path.join(post_dir, "index.md"), 'w', encoding='utf-8') as f:
+            f.write(
+                f'---\ntitle: "基准测试 {index}"\ndate: 2025-{index % 12 + 1:02d}-{index % 28 + 1:02d}T10:00:00+08:00\n'
+                f'categories: ["测试", "分类{index % 7}"]\ndraft: false\n---\n\n{source}'
+            )
+    return site_dir, sources
+
+# --- Stand-in Services ---
+
+def init_git_site(site_dir, remote_dir):
+    """Turns site_dir into a clone of a fresh local bare repository."""
+    subprocess.run(["git", "init", "-q", "--bare", remote_dir], check=True)
+    for args in (["init", "-q"], ["remote", "add", "origin", remote_dir],
+                 ["config", "user.name", "benchmark"], ["config", "user.email", "benchmark@localhost"],
+                 ["add", "-A"], ["commit", "-q", "-m", "Initial site"], ["push", "-q", "-u", "origin", "HEAD"]):
+        subprocess.run(["git"] + args, cwd=site_dir, check=True)
+
+def start_link_server(latency):
+    """
+    Starts a local server answering every HEAD or GET with 200 and an ETag (or
+    304 when it matches) after `latency` seconds, standing in for remote sites.
+    """
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class LinkHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_HEAD(self):
+            time.sleep(latency)
+            status = 304 if self.headers.get("If-None-Match") == '"v1"' else 200
+            self.send_response(status)
+            self.send_header("ETag", '"v1"')
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        do_GET = do_HEAD
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), LinkHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+# --- Timing ---
+
+def measure(repeat, func, setup=None):
+    """Runs func `repeat` times (after setup, if given) and returns timing stats in seconds."""
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return {"median": statistics.median(timings), "min": min(timings), "runs": repeat}
+
+def measure_startup(repeat):
+    """Times `blog-uploader --help` in a fresh interpreter and the import of the main module."""
+    help_cmd = [sys.executable, "-c", "import sys; sys.argv = ['blog-uploader', '--help']; from blog_uploader.main import cli; cli()"]
+    results = {"startup_help": measure(repeat, lambda: subprocess.run(help_cmd, capture_output=True, check=True))}
+
+    import_us = []
+    for _ in range(repeat):
+        output = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import blog_uploader.main"], capture_output=True, text=True, check=True
+        ).stderr
+        for line in output.splitlines():
+            if line.rstrip().endswith("| blog_uploader.main"):
+                import_us.append(int(line.split("|")[1]))
+    if import_us:
+        results["startup_import"] = {"median": statistics.median(import_us) / 1e6, "min": min(import_us) / 1e6, "runs": repeat}
+    return results
+
+def run_benchmarks(root, posts, images, secrets, repeat):
+    """Generates the site, times every hot path and returns {name: stats}."""
+    from Crypto.PublicKey import RSA
+    from blog_uploader import main, image_server
+
+    site_dir, sources = generate_site(root, posts, images, secrets)
+    os.makedirs(os.path.join(root, "home", ".blog_uploader"))
+    os.environ["HOME"] = os.path.join(root, "home")
+
+    server = image_server.start_image_server(
+        {"type": "local", "directory": os.path.join(root, "uploads"), "base_url": "https://cdn.example.com"}
+    )
+    key = RSA.generate(2048)
+    public_key_path = os.path.join(root, "public.pem")
+    with open(public_key_path, 'wb') as f:
+        f.write(key.publickey().export_key())
+    main.save_config({
+        "picgo_url": image_server.get_upload_url(server),
+        "public_key_path": public_key_path,
+    })
+
+    with open(sources[0], 'r', encoding='utf-8') as f:
+        source = f.read()
+    notes_dir = os.path.dirname(sources[0])
+    clean_source = main.replace_image_links(source, {})
+    secret_repo_dir = os.path.join(root, "secret")
+    os.makedirs(secret_repo_dir)
+    public_key = main.get_or_setup_public_key()
+    _, secret_content = main.process_strikethrough_content("0" * 64, clean_source, confirm=False)
+    secret_content = secret_content or {}
+
+    def drop_index():
+        if os.path.exists(main.get_post_index_path()):
+            os.remove(main.get_post_index_path())
+
+    def drop_image_cache():
+        if os.path.exists(main.get_image_cache_path()):
+            os.remove(main.get_image_cache_path())
+
+    def drop_secrets():
+        shutil.rmtree(secret_repo_dir)
+        os.makedirs(secret_repo_dir)
+
+    results = {}
+    results["list_index_cold"] = measure(repeat, lambda: main.update_post_index(site_dir), setup=drop_index)
+    results["list_index_warm"] = measure(repeat, lambda: main.update_post_index(site_dir))
+    results["preprocess_upload_cold"] = measure(
+        repeat, lambda: main.preprocess_markdown_content(source, notes_dir), setup=drop_image_cache
+    )
+    results["preprocess_cached"] = measure(repeat, lambda: main.preprocess_markdown_content(source, notes_dir))
+    image_dir = os.path.join(notes_dir, "images")
+    image_paths = sorted(os.path.join(image_dir, name) for name in os.listdir(image_dir))
+    results["upload_paths"] = measure(repeat, lambda: main.upload_images_with_picgo(image_paths))
+    main.update_config(upload_mode="multipart")
+    results["upload_multipart"] = measure(repeat, lambda: main.upload_images_with_picgo(image_paths))
+    main.update_config(upload_mode="paths")
+    results["strikethrough"] = measure(
+        repeat, lambda: main.process_strikethrough_content("0" * 64, clean_source, confirm=False)
+    )
+    results["encrypt_new"] = measure(
+        repeat, lambda: main.write_secret_file(secret_repo_dir, "0" * 64, secret_content, public_key), setup=drop_secrets
+    )
+    results["encrypt_unchanged"] = measure(
+        repeat, lambda: main.write_secret_file(secret_repo_dir, "0" * 64, secret_content, public_key)
+    )
+
+    init_git_site(site_dir, os.path.join(root, "remote.git"))
+    counter = iter(range(repeat))
+
+    def touch_post():
+        index_md_path = os.path.join(site_dir, "content", "post", "post-0", "index.md")
+        with open(index_md_path, 'r', encoding='utf-8') as f:
+            content = f.read()
+        main.write_file_if_changed(index_md_path, content + f"\nedit {next(counter)}\n")
+
+    results["commit_and_push"] = measure(repeat, lambda: main.commit_and_push(site_dir, "Benchmark commit"), setup=touch_post)
+    server.shutdown()
+
+    # Two links per post, spread over two host names so the per-host limit matters.
+    link_server = start_link_server(latency=0.01)
+    port = link_server.server_address[1]
+    urls = [f"http://{host}:{port}/post-{index}" for index in range(posts) for host in ("127.0.0.1", "localhost")]
+    results["check_links_cold"] = measure(repeat, lambda: main.check_links(urls, refresh=True))
+    results["check_links_revalidate"] = measure(repeat, lambda: main.check_links(urls, ttl=0))
+    link_server.shutdown()
+    return results
+
+# --- Reporting ---
+
+def compare_with_baseline(results, baseline, tolerance):
+    """Returns (name, current, baseline, ratio, regressed) rows for every shared benchmark."""
+    rows = []
+    for name, stats in results.items():
+        if name not in baseline.get("results", {}):
+            continue
+        base = baseline["results"][name]["median"]
+        ratio = stats["median"] / base if base else float("inf")
+        rows.append((name, stats["median"], base, ratio, ratio > 1 + tolerance))
+    return rows
+
+def print_results(results, rows):
+    """Prints the timings (and baseline comparison, if any) as a rich table."""
+    from rich.console import Console
+    from rich.table import Table
+
+    compared = {row[0]: row for row in rows}
+    table = Table(title="blog-uploader benchmarks")
+    table.add_column("Benchmark", style="cyan")
+    table.add_column("Median (ms)", justify="right", style="yellow")
+    table.add_column("Min (ms)", justify="right")
+    table.add_column("Baseline (ms)", justify="right", style="magenta")
+    table.add_column("Change", justify="right")
+    for name, stats in results.items():
+        baseline_str, change_str = "", ""
+        if name in compared:
+            _, _, base, ratio, regressed = compared[name]
+            baseline_str = f"{base * 1000:.2f}"
+            change_str = f"[{'red' if regressed else 'green'}]{(ratio - 1) * 100:+.1f}%[/]"
+        table.add_row(name, f"{stats['median'] * 1000:.2f}", f"{stats['min'] * 1000:.2f}", baseline_str, change_str)
+    Console().print(table)
+
+@click.command()
+@click.option('--posts', default=200, help='Number of posts in the synthetic site.')
+@click.option('--images', default=3, help='Local images per post.')
+@click.option('--secrets', default=3, help='Strikethrough secret spans per post.')
+@click.option('--repeat', default=5, help='Runs per benchmark; the median is reported.')
+@click.option('--output', type=click.Path(dir_okay=False), help='Write the results as JSON to this file.')
+@click.option('--baseline', type=click.Path(exists=True, dir_okay=False), help='Compare against a previous --output file.')
+@click.option('--tolerance', default=0.2, help='Allowed slowdown against the baseline before failing (0.2 = 20%).')
+@click.option('--keep', is_flag=True, help='Keep the generated site instead of deleting it.')
+def main(posts, images, secrets, repeat, output, baseline, tolerance, keep):
+    """Benchmark the uploader's hot paths on a synthetic site."""
+    root = tempfile.mkdtemp(prefix="blog_uploader_bench_")
+    home = os.environ.get("HOME")
+    try:
+        results = measure_startup(repeat)
+        results.update(run_benchmarks(root, posts, images, secrets, repeat))
+    finally:
+        if home is not None:
+            os.environ["HOME"] = home
+        if keep:
+            click.echo(f"Generated site kept at {root}")
+        else:
+            shutil.rmtree(root, ignore_errors=True)
+
+    report = {
+        "params": {"posts": posts, "images": images, "secrets": secrets, "repeat": repeat},
+        "python": sys.version.split()[0],
+        "timestamp": time.time(),
+        "results": results,
+    }
+    rows = []
+    if baseline:
+        with open(baseline, 'r', encoding='utf-8') as f:
+            rows = compare_with_baseline(results, json.load(f), tolerance)
+    print_results(results, rows)
+
+    if output:
+        with open(output, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+        click.echo(f"Results written to {output}")
+
+    regressions = [row[0] for row in rows if row[4]]
+    if regressions:
+        click.echo(click.style(f"Regressions beyond {tolerance:.0%}: {', '.join(regressions)}", fg="red"), err=True)
+        sys.exit(1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,208 @@
+"""
+A PicGo-compatible image upload server with pluggable storage backends.
+
+It speaks the same POST /upload contract as PicGo's built-in server, so the
+uploader (or anything else that talks to PicGo) works with it unchanged:
+
+- an application/json body {"list": ["/path/a.png", ...]} uploads image files
+  the server can read (accepted only from the local machine),
+- a multipart/form-data body uploads the files sent along with the request.
+
+Only raster images are stored; the stored file's extension comes from the
+image's own signature, never from the client's filename.
+
+Both are answered with {"success": true, "result": [url, ...]} in request order.
+Run it with `blog-uploader serve-images`, or let the uploader start it
+in-process by setting "image_store" in the config.
+"""
+import os
+import re
+import json
+import hashlib
+import threading
+import ipaddress
+
+DEFAULT_PORT = 36677
+
+# --- Image Types ---
+
+# Extensions a listed local path may have before the server will read it.
+IMAGE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.gif', '.webp', '.avif', '.bmp', '.tif', '.tiff', '.ico'}
+# File signatures of the accepted formats and the extension they are stored under.
+# Nothing a browser would run (HTML, SVG) can get through.
+IMAGE_SIGNATURES = [
+    (b"\x89PNG\r\n\x1a\n", ".png"),
+    (b"\xff\xd8\xff", ".jpg"),
+    (b"GIF87a", ".gif"),
+    (b"GIF89a", ".gif"),
+    (b"II*\x00", ".tif"),
+    (b"MM\x00*", ".tif"),
+    (b"\x00\x00\x01\x00", ".ico"),
+]
+BMP_HEADER_SIZES = {12, 40, 52, 56, 108, 124}
+
+def image_extension(data):
+    """Returns the extension for the image format of data, or raises ValueError if it is not an image."""
+    for signature, extension in IMAGE_SIGNATURES:
+        if data.startswith(signature):
+            return extension
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return ".webp"
+    if data[4:8] == b"ftyp" and data[8:12] in (b"avif", b"avis"):
+        return ".avif"
+    if data[:2] == b"BM" and int.from_bytes(data[14:18], "little") in BMP_HEADER_SIZES:
+        return ".bmp"
+    raise ValueError("Not a supported image (PNG, JPEG, GIF, WebP, AVIF, BMP, TIFF or ICO).")
+
+# --- Storage Backends ---
+
+class LocalStore:
+    """
+    Stores images in a local directory (e.g. a static site's image folder) under
+    content-addressed names, and returns their URL below base_url. Anything that
+    is not an image is rejected with ValueError.
+    """
+
+    def __init__(self, directory, base_url):
+        self.directory = os.path.abspath(os.path.expanduser(directory))
+        self.base_url = base_url.rstrip("/")
+        os.makedirs(self.directory, exist_ok=True)
+
+    def save(self, filename, data):
+        extension = image_extension(data)
+        name = hashlib.sha256(data).hexdigest()[:32] + extension
+        path = os.path.join(self.directory, name)
+        # The same content always gets the same name, so a repeated upload is free.
+        if not os.path.exists(path):
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        return f"{self.base_url}/{name}"
+
+# Storage backends by the "type" key of the image_store settings.
+STORE_TYPES = {
+    "local": LocalStore,
+}
+
+def create_store(settings):
+    """Creates the storage backend described by settings ({"type": ..., **options})."""
+    options = dict(settings)
+    store_type = options.pop("type", "local")
+    if store_type not in STORE_TYPES:
+        raise ValueError(f"Unknown image store type '{store_type}'. Available: {', '.join(sorted(STORE_TYPES))}.")
+    return STORE_TYPES[store_type](**options)
+
+# --- Server ---
+
+MULTIPART_BOUNDARY_PATTERN = re.compile(r'boundary="?([^";]+)"?')
+MULTIPART_FILENAME_PATTERN = re.compile(rb'filename="([^"]*)"')
+
+def parse_multipart(content_type, body):
+    """Returns [(filename, data)] for every file in a multipart/form-data body."""
+    match = MULTIPART_BOUNDARY_PATTERN.search(content_type)
+    if not match:
+        raise ValueError("Multipart body without a boundary.")
+    delimiter = b"--" + match.group(1).encode('latin-1')
+
+    files = []
+    for part in body.split(delimiter)[1:]:
+        if part.startswith(b"--"):
+            break
+        headers, separator, data = part.partition(b"\r\n\r\n")
+        if not separator:
+            raise ValueError("Malformed multipart body.")
+        filename = MULTIPART_FILENAME_PATTERN.search(headers)
+        if filename:
+            files.append((filename.group(1).decode('utf-8'), data[:-2] if data.endswith(b"\r\n") else data))
+    return files
+
+def read_listed_files(body):
+    """Returns [(filename, data)] for the local image paths in a PicGo JSON body."""
+    paths = json.loads(body)["list"]
+    files = []
+    for path in paths:
+        if os.path.splitext(path)[1].lower() not in IMAGE_EXTENSIONS:
+            raise ValueError(f"Not an image file: {path}")
+        with open(path, 'rb') as f:
+            files.append((os.path.basename(path), f.read()))
+    return files
+
+def is_loopback(host):
+    """Returns whether a client address belongs to this machine."""
+    try:
+        address = ipaddress.ip_address(host)
+    except ValueError:
+        return False
+    return address.is_loopback or bool(getattr(address, "ipv4_mapped", None) and address.ipv4_mapped.is_loopback)
+
+def make_handler(store):
+    """Builds the request handler class serving uploads into store."""
+    from http.server import BaseHTTPRequestHandler
+
+    class UploadHandler(BaseHTTPRequestHandler):
+        # Keep-alive lets a pooled client session reuse its connections; without
+        # Nagle, a response's headers and body are not held back by delayed ACKs.
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if self.path.split("?", 1)[0] != "/upload":
+                self.send_json(404, {"success": False, "message": "Not found"})
+                return
+            content_type = self.headers.get("Content-Type", "")
+            media_type = content_type.split(";", 1)[0].strip().lower()
+            if media_type == "application/json" and not is_loopback(self.client_address[0]):
+                # Path lists read this machine's files, so only local clients may send them.
+                self.send_json(403, {"success": False, "message": "Path uploads are only accepted from this machine."})
+                return
+            if media_type not in ("application/json", "multipart/form-data"):
+                self.send_json(415, {"success": False, "message": "Expected application/json or multipart/form-data."})
+                return
+            try:
+                if media_type == "multipart/form-data":
+                    files = parse_multipart(content_type, body)
+                else:
+                    files = read_listed_files(body)
+                urls = [store.save(filename, data) for filename, data in files]
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                # Like PicGo, failures are reported in the body rather than the status.
+                self.send_json(200, {"success": False, "message": str(e)})
+                return
+            self.send_json(200, {"success": True, "result": urls})
+
+        def send_json(self, status, payload):
+            data = json.dumps(payload).encode('utf-8')
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return UploadHandler
+
+def create_server(store, host="127.0.0.1", port=DEFAULT_PORT):
+    """Creates a threaded server handling concurrent uploads into store."""
+    from http.server import ThreadingHTTPServer
+
+    server = ThreadingHTTPServer((host, port), make_handler(store))
+    server.daemon_threads = True
+    return server
+
+def start_image_server(settings, host="127.0.0.1", port=0):
+    """
+    Starts a server for the store described by settings on a background thread
+    and returns it; its upload URL is get_upload_url(server). Port 0 picks a free port.
+    """
+    server = create_server(create_store(settings), host, port)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def get_upload_url(server):
+    """Returns the /upload URL of a running server."""
+    host, port = server.server_address[:2]
+    return f"http://{host}:{port}/upload"
@@ -2,25 +2,22 @@ import os
 import sys
 import shutil
 import click
-import git
 import time
 import datetime
-import frontmatter
 import platform
 import subprocess
 import re
-import requests
 import hashlib
 import json
 import base64
 import builtins
-from slugify import slugify
-from Crypto.PublicKey import RSA
-from Crypto.Cipher import AES, PKCS1_v1_5
-from Crypto.Random import get_random_bytes
-from Crypto.Util.Padding import pad
-from rich.console import Console
-from rich.table import Table
+import glob
+import threading
+import functools
+import contextlib
+
+# Heavy third-party modules (git, requests, frontmatter, Crypto, rich, slugify)
+# are imported inside the functions that use them to keep CLI startup fast.
 
 # --- Helper Functions ---
 
@@ -76,39 +73,74 @@ def get_config_path():
     home_dir = os.path.expanduser("~")
     return os.path.join(home_dir, ".blog_uploader", "config.json")
 
+# The parsed config, kept per process and re-read only when the file changes.
+CONFIG_CACHE = {}
+CONFIG_LOCK = threading.Lock()
+
+def get_file_stamp(path):
+    """Returns (mtime, size) of path, or None if it does not exist."""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
 def load_config():
-    """Loads the config file."""
+    """Loads the config file. Returns a copy the caller may modify."""
     config_path = get_config_path()
-    if os.path.exists(config_path):
-        with open(config_path, 'r') as f:
-            return json.load(f)
-    return {}
+    with CONFIG_LOCK:
+        stamp = get_file_stamp(config_path)
+        if CONFIG_CACHE.get("key") != (config_path, stamp):
+            config = {}
+            if stamp is not None:
+                with open(config_path, 'r') as f:
+                    config = json.load(f)
+            CONFIG_CACHE.update(key=(config_path, stamp), config=config)
+        return dict(CONFIG_CACHE["config"])
 
 def save_config(config):
-    """Saves the config file."""
+    """Saves the config file atomically, holding the config lock."""
+    config_path = get_config_path()
+    with file_lock(config_path):
+        write_json_atomic(config_path, config, indent=4)
+
+def update_config(**changes):
+    """
+    Sets the given keys in the config file. The file is re-read under the lock,
+    so keys written by a parallel run in the meantime are not lost.
+    """
     config_path = get_config_path()
-    os.makedirs(os.path.dirname(config_path), exist_ok=True)
-    with open(config_path, 'w') as f:
-        json.dump(config, f, indent=4)
+    with file_lock(config_path):
+        config = load_config()
+        config.update(changes)
+        write_json_atomic(config_path, config, indent=4)
+    return config
+
+@functools.lru_cache(maxsize=None)
+def import_public_key(public_key_path, stamp):
+    """Parses an RSA public key file once per process (stamp is its mtime and size)."""
+    from Crypto.PublicKey import RSA
+
+    with open(public_key_path, 'r') as f:
+        return RSA.import_key(f.read())
 
 def get_or_setup_public_key():
     """
     Gets the public key from config, or guides the user through setting one up.
     """
+    from Crypto.PublicKey import RSA
+
     config = load_config()
     public_key_path = config.get("public_key_path")
 
     if public_key_path and os.path.exists(public_key_path):
-        with open(public_key_path, 'r') as f:
-            return RSA.import_key(f.read())
+        return import_public_key(public_key_path, get_file_stamp(public_key_path))
 
     click.echo("RSA public key not found or configured.")
     if click.confirm("Do you have an existing RSA public key file to use?"):
         public_key_path = click.prompt("Please enter the path to your RSA public key", type=click.Path(exists=True, dir_okay=False))
-        config["public_key_path"] = public_key_path
-        save_config(config)
-        with open(public_key_path, 'r') as f:
-            return RSA.import_key(f.read())
+        update_config(public_key_path=public_key_path)
+        return import_public_key(public_key_path, get_file_stamp(public_key_path))
     elif click.confirm("Would you like to generate a new RSA key pair now?"):
         key = RSA.generate(2048)
         private_key = key.export_key(pkcs=1) # Export in PKCS#1 format for JSEncrypt compatibility
@@ -131,14 +163,120 @@ def get_or_setup_public_key():
         click.echo(click.style("---  END RSA PRIVATE KEY  ---", fg="cyan"))
         click.echo(click.style("\nPlease COPY the private key above and use it on your website for decryption.", fg="red", bold=True))
         
-        config["public_key_path"] = public_key_path
-        config["private_key_path"] = private_key_path # Also save private key path for later retrieval
-        save_config(config)
+        # Also save private key path for later retrieval
+        update_config(public_key_path=public_key_path, private_key_path=private_key_path)
         return RSA.import_key(public_key)
     else:
         click.echo("Cannot proceed without a public key. Aborting.", err=True)
         sys.exit(1)
 
+# --- Profiling ---
+# Every phase of a command is recorded as a (possibly nested) span. The spans
+# are cheap to collect; they are only printed with --profile or written as a
+# Chrome trace (chrome://tracing, Perfetto) with --trace-file.
+
+TRACE_SPANS = []
+TRACE_STATE = threading.local()
+TRACE_LOCK = threading.Lock()
+TRACE_EPOCH = time.perf_counter()
+
+@contextlib.contextmanager
+def trace_span(name, **args):
+    """Records how long the wrapped block takes as a span nested under the current one."""
+    stack = getattr(TRACE_STATE, "stack", None)
+    if stack is None:
+        stack = TRACE_STATE.stack = []
+    path = tuple(stack) + (name,)
+    stack.append(name)
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        end = time.perf_counter()
+        stack.pop()
+        with TRACE_LOCK:
+            TRACE_SPANS.append({
+                "name": name,
+                "path": path,
+                "start": start - TRACE_EPOCH,
+                "duration": end - start,
+                "thread": threading.get_ident(),
+                "args": args,
+            })
+
+def traced(name):
+    """Decorator that wraps every call of a function in a trace span."""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with trace_span(name):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def inherit_trace(func):
+    """
+    Wraps func so that, when run on a worker thread, its spans nest under the
+    span that was open when inherit_trace was called.
+    """
+    parent = builtins.list(getattr(TRACE_STATE, "stack", None) or [])
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        previous = getattr(TRACE_STATE, "stack", None)
+        TRACE_STATE.stack = builtins.list(parent)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            TRACE_STATE.stack = previous
+    return wrapper
+
+def print_profile_summary():
+    """Prints the recorded spans as a table, aggregated by their nesting path."""
+    from rich.console import Console
+    from rich.table import Table
+
+    if not TRACE_SPANS:
+        return
+    totals = {}
+    first_start = {}
+    for span in sorted(TRACE_SPANS, key=lambda span: span["start"]):
+        calls, duration = totals.get(span["path"], (0, 0.0))
+        totals[span["path"]] = (calls + 1, duration + span["duration"])
+        first_start.setdefault(span["path"], span["start"])
+    # Spans started on worker threads are roots too; the command span is the longest one.
+    run_time = max((duration for path, (_, duration) in totals.items() if len(path) == 1), default=0.0) or 1.0
+
+    table = Table(title="Profile")
+    table.add_column("Phase", style="cyan", no_wrap=True)
+    table.add_column("Calls", justify="right")
+    table.add_column("Total (ms)", justify="right", style="yellow")
+    table.add_column("% of run", justify="right", style="magenta")
+    # Sorting by the start times of each ancestor puts every child directly below its parent.
+    for path in sorted(totals, key=lambda path: [first_start.get(path[:i + 1], 0.0) for i in range(len(path))]):
+        calls, duration = totals[path]
+        table.add_row("  " * (len(path) - 1) + path[-1], str(calls), f"{duration * 1000:.1f}", f"{duration / run_time:.0%}")
+    Console(stderr=True).print(table)
+
+def write_chrome_trace(trace_path):
+    """Writes the recorded spans in the Chrome trace event format."""
+    events = [
+        {
+            "name": span["name"],
+            "cat": "blog-uploader",
+            "ph": "X",
+            "ts": round(span["start"] * 1e6),
+            "dur": round(span["duration"] * 1e6),
+            "pid": os.getpid(),
+            "tid": span["thread"],
+            "args": {key: str(value) for key, value in span["args"].items()},
+        }
+        for span in TRACE_SPANS
+    ]
+    with open(trace_path, 'w', encoding='utf-8') as f:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, f)
+    click.echo(f"Trace written to {trace_path}", err=True)
+
 # --- Configuration ---
 # In a real application, this would be loaded from a config file.
 # For now, we'll keep them as constants.
@@ -151,428 +289,3092 @@ SECRET_TEMP_DIR_NAME = "temp_blog_secret"
 
 # --- Helper Functions ---
 
-def get_temp_dir():
+DEFAULT_SYNC_TTL = 300 # seconds a read-only command trusts the last fetch
+DEFAULT_CLONE_MODE = "partial" # partial, shallow or full
+
+# Set by the cli group callback. Kept at module level rather than on the click
+# context so worker threads (which have no click context) see the same options.
+RUNTIME_OPTIONS = {}
+SYNC_STATE_LOCK = threading.Lock()
+
+def get_runtime_options():
+    """Returns the global CLI options (e.g. --offline) for the running command."""
+    return RUNTIME_OPTIONS
+
+def write_json_atomic(path, data, indent=None):
+    """Writes JSON to a temporary file and moves it into place."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=indent)
+    os.replace(tmp_path, path)
+
+@contextlib.contextmanager
+def file_lock(path):
+    """Holds an exclusive lock on <path>.lock, shared by every uploader process."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".lock", 'a+b') as f:
+        if os.name == 'nt':
+            import msvcrt
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+def get_sync_state_path():
+    """Returns the path to the file recording when each repo was last fetched."""
+    home_dir = os.path.expanduser("~")
+    return os.path.join(home_dir, ".blog_uploader", "sync_state.json")
+
+def load_sync_state():
+    """Loads the repo sync state."""
+    state_path = get_sync_state_path()
+    if os.path.exists(state_path):
+        try:
+            with open(state_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            pass
+    return {}
+
+def record_sync(repo_dir, remote_head):
+    """Records that repo_dir was just synced and which remote HEAD it saw."""
+    with SYNC_STATE_LOCK:
+        state = load_sync_state()
+        state[repo_dir] = {"last_fetch": time.time(), "remote_head": remote_head}
+        write_json_atomic(get_sync_state_path(), state)
+
+def get_remote_head(repo):
+    """Asks the remote for its HEAD commit without fetching any objects."""
+    output = repo.git.ls_remote("origin", "HEAD")
+    return output.split()[0] if output else None
+
+def clone_repo(url, repo_dir):
+    """Clones url into repo_dir using the configured clone mode."""
+    import git
+
+    clone_mode = load_config().get("clone_mode", DEFAULT_CLONE_MODE)
+    if clone_mode == "shallow":
+        repo = git.Repo.clone_from(url, repo_dir, depth=1, no_single_branch=True)
+    elif clone_mode == "partial":
+        # Blobs of old revisions (mostly images) are only fetched if something asks for them.
+        repo = git.Repo.clone_from(url, repo_dir, filter="blob:none")
+    else:
+        repo = git.Repo.clone_from(url, repo_dir)
+    record_sync(repo_dir, repo.head.commit.hexsha if repo.head.is_valid() else None)
+    return repo
+
+def sync_repo(url, repo_dir, label, read_only=False):
+    """
+    Clones or updates a checkout, avoiding network work where possible.
+    Read-only callers skip the remote entirely while the last fetch is younger
+    than the sync TTL; everyone else only pulls when the remote HEAD moved.
+    """
+    import git
+
+    options = get_runtime_options()
+
+    if not os.path.exists(repo_dir):
+        if options.get("offline"):
+            click.echo(f"Error: {label} has not been cloned yet and --offline was given.", err=True)
+            sys.exit(1)
+        click.echo(f"Cloning {label} from {url}...")
+        clone_repo(url, repo_dir)
+        click.echo(f"{label.capitalize()} cloned to {repo_dir}")
+        return repo_dir
+
+    if options.get("offline"):
+        click.echo(f"Offline mode: using the local copy of the {label}.")
+        return repo_dir
+
+    state = load_sync_state().get(repo_dir, {})
+    ttl = options.get("sync_ttl")
+    if ttl is None:
+        ttl = load_config().get("sync_ttl", DEFAULT_SYNC_TTL)
+    age = time.time() - state.get("last_fetch", 0)
+    if read_only and age < ttl:
+        click.echo(f"The {label} was synced {int(age)}s ago, skipping pull.")
+        return repo_dir
+
+    repo = git.Repo(repo_dir)
+    remote_head = get_remote_head(repo)
+    up_to_date = remote_head is not None and remote_head == state.get("remote_head")
+    if not up_to_date and remote_head:
+        try:
+            up_to_date = repo.is_ancestor(remote_head, repo.head.commit)
+        except git.GitCommandError:
+            up_to_date = False # The remote commit is not known locally yet.
+
+    if not up_to_date:
+        click.echo(f"Pulling latest changes for the {label}...")
+        repo.remotes.origin.pull()
+    click.echo(f"The {label} is up to date.")
+    record_sync(repo_dir, remote_head)
+    return repo_dir
+
+@traced("get_temp_dir")
+def get_temp_dir(read_only=False):
     """Gets the temporary directory path and ensures it exists."""
     # Use the user's home directory for temporary files to avoid permission issues
     # and keep the project directory clean.
     home_dir = os.path.expanduser("~")
     temp_dir = os.path.join(home_dir, ".blog_uploader", TEMP_DIR_NAME)
-    
-    if not os.path.exists(temp_dir):
-        click.echo(f"Cloning repository from {REPO_URL}...")
-        git.Repo.clone_from(REPO_URL, temp_dir)
-        click.echo(f"Repository cloned to {temp_dir}")
-    else:
-        click.echo("Pulling latest changes...")
-        repo = git.Repo(temp_dir)
-        repo.remotes.origin.pull()
-        click.echo("Repository is up to date.")
-        
-    return temp_dir
+    return sync_repo(REPO_URL, temp_dir, "repository", read_only)
 
-def get_secret_repo_dir():
+@traced("get_secret_repo_dir")
+def get_secret_repo_dir(read_only=False):
     """Gets the temporary directory path for the secret repo and ensures it exists."""
     home_dir = os.path.expanduser("~")
     temp_dir = os.path.join(home_dir, ".blog_uploader", SECRET_TEMP_DIR_NAME)
-    
-    if not os.path.exists(temp_dir):
-        click.echo(f"Cloning secret repository from {SECRET_REPO_URL}...")
-        git.Repo.clone_from(SECRET_REPO_URL, temp_dir)
-        click.echo(f"Secret repository cloned to {temp_dir}")
-    else:
-        click.echo("Pulling latest changes from secret repository...")
-        repo = git.Repo(temp_dir)
-        repo.remotes.origin.pull()
-        click.echo("Secret repository is up to date.")
-        
-    return temp_dir
+    return sync_repo(SECRET_REPO_URL, temp_dir, "secret repository", read_only)
 
+@traced("commit_and_push")
 def commit_and_push(repo_path, message):
-    """Adds all changes, commits, and pushes them."""
+    """Stages the planned changes (see stage_changes), commits, and pushes them."""
+    import git
+
     try:
         repo = git.Repo(repo_path)
-        repo.git.add(A=True)
+        stage_changes(repo, repo_path)
         repo.index.commit(message)
-        repo.remotes.origin.push()
+        if get_runtime_options().get("offline"):
+            click.echo("Offline mode: changes committed locally, push skipped.")
+            return
+        push_repo(repo_path)
         click.echo("Changes committed and pushed successfully.")
     except Exception as e:
         click.echo(f"Error during git operation: {e}", err=True)
         sys.exit(1)
 
-def upload_images_with_picgo(image_paths):
-    """Uploads images using the PicGo server API."""
-    url = "http://127.0.0.1:36677/upload"
-    try:
-        # PicGo's API expects a JSON payload with a 'list' of file paths
-        response = requests.post(url, json={"list": image_paths})
-        response.raise_for_status()
-        result = response.json()
-        if result.get("success"):
-            return result.get("result", [])
-        else:
-            click.echo(f"PicGo API Error: {result.get('message', 'Unknown error')}", err=True)
-            return []
-    except requests.exceptions.RequestException as e:
-        click.echo(f"Failed to connect to PicGo server at {url}. Is it running?", err=True)
-        click.echo(f"Error: {e}", err=True)
-        return []
+def sync_all_repos(read_only=False):
+    """Syncs the blog and secret checkouts concurrently and returns both paths."""
+    from concurrent.futures import ThreadPoolExecutor
 
-def preprocess_markdown_content(content, base_dir):
-    """Finds local images, uploads them via PicGo, and replaces links."""
-    # Regex to find markdown image links ![]() that are not web URLs
-    image_pattern = re.compile(r'!\[(.*?)\]\((?!https?://)(.*?)\)')
-    
-    original_paths = []
-    absolute_paths = []
-    
-    for match in image_pattern.finditer(content):
-        image_path = match.group(2)
-        original_paths.append(image_path)
-        
-        abs_path = image_path
-        if not os.path.isabs(abs_path):
-            abs_path = os.path.abspath(os.path.join(base_dir, image_path))
-        
-        if os.path.exists(abs_path):
-            absolute_paths.append(abs_path)
-        else:
-            click.echo(click.style(f"Warning: Image not found at {abs_path}", fg="yellow"))
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        temp_future = executor.submit(inherit_trace(get_temp_dir), read_only)
+        secret_future = executor.submit(inherit_trace(get_secret_repo_dir), read_only)
+        return temp_future.result(), secret_future.result()
 
-    if not absolute_paths:
-        return content
+# --- Publish Planning ---
+# Files in the checkouts are written through write_file_if_changed and deleted
+# through remove_path, which skip writes that would not change anything and
+# remember every path they touched. Commits then stage just those paths instead
+# of scanning the whole tree with `git add -A`.
 
-    click.echo(f"Found {len(absolute_paths)} local images to upload.")
-    uploaded_urls = upload_images_with_picgo(absolute_paths)
+PUBLISH_PLAN = {"active": False, "paths": set()}
+PUBLISH_PLAN_LOCK = threading.Lock()
 
-    if not uploaded_urls or len(uploaded_urls) != len(absolute_paths):
-        click.echo("Image upload failed or returned incomplete results. Aborting.", err=True)
-        sys.exit(1)
+def plan_path(path):
+    """Records that path was written or deleted and must be staged with the next commit."""
+    with PUBLISH_PLAN_LOCK:
+        PUBLISH_PLAN["active"] = True
+        PUBLISH_PLAN["paths"].add(os.path.abspath(path))
 
-    # Create a map of original local path -> remote URL
-    path_to_url_map = dict(zip(original_paths, uploaded_urls))
+def write_file_if_changed(path, data):
+    """
+    Writes data (str or bytes) to path unless the file already has exactly this
+    content, comparing sizes first and then content hashes. Returns True if the
+    file was written.
+    """
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    with PUBLISH_PLAN_LOCK:
+        # Even an unchanged write means the caller manages what gets staged.
+        PUBLISH_PLAN["active"] = True
+    if get_file_stamp(path) is not None and os.path.getsize(path) == len(data):
+        with open(path, 'rb') as f:
+            if hashlib.sha256(f.read()).digest() == hashlib.sha256(data).digest():
+                return False
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as f:
+        f.write(data)
+    plan_path(path)
+    return True
 
-    # Replace local paths with remote URLs in the content
-    def replace_path(match):
-        original_path = match.group(2)
-        alt_text = match.group(1)
-        
-        remote_url = path_to_url_map.get(original_path)
-        if remote_url:
-            return f'![{alt_text}]({remote_url})'
-        else:
-            # Return original if something went wrong (e.g., file not found)
-            return match.group(0)
+def remove_path(path):
+    """Deletes a file or directory tree, if it exists, and plans its removal."""
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    elif os.path.lexists(path):
+        os.remove(path)
+    else:
+        return
+    plan_path(path)
 
-    updated_content = image_pattern.sub(replace_path, content)
-    click.echo("Successfully replaced local image paths with remote URLs.")
-    return updated_content
+def sync_directory(directory, files):
+    """
+    Makes directory hold exactly files ({relative path: content}): changed files
+    are written, identical ones are left alone and all others are deleted.
+    """
+    wanted = {os.path.normpath(os.path.join(directory, name)) for name in files}
+    if os.path.isdir(directory):
+        for root, dirs, filenames in os.walk(directory):
+            for filename in filenames:
+                path = os.path.normpath(os.path.join(root, filename))
+                if path not in wanted:
+                    remove_path(path)
+    for name, content in files.items():
+        write_file_if_changed(os.path.join(directory, name), content)
 
-def process_strikethrough_content(title_hash, content):
+def read_directory(directory):
+    """Reads every file below directory into {relative path: bytes}."""
+    files = {}
+    for root, dirs, filenames in os.walk(directory):
+        for filename in filenames:
+            path = os.path.join(root, filename)
+            with open(path, 'rb') as f:
+                files[os.path.relpath(path, directory)] = f.read()
+    return files
+
+def take_planned_paths(repo_path):
     """
-    Finds all strikethrough content, asks the user if they want to separate it,
-    and replaces it with a placeholder.
+    Removes and returns the planned paths inside repo_path, relative to it, or
+    None if nothing was planned in this run and the whole tree must be staged.
     """
-    # This regex finds content wrapped in ~~...~~
-    strikethrough_pattern = re.compile(r'~~(.+?)~~', re.DOTALL)
-    
-    matches = [m for m in strikethrough_pattern.finditer(content)]
-    
-    if not matches:
-        return content, None
+    root = os.path.abspath(repo_path) + os.sep
+    with PUBLISH_PLAN_LOCK:
+        if not PUBLISH_PLAN["active"]:
+            return None
+        paths = {path for path in PUBLISH_PLAN["paths"] if path.startswith(root)}
+        PUBLISH_PLAN["paths"] -= paths
+    return sorted(os.path.relpath(path, repo_path) for path in paths)
 
-    click.echo(f"Found {len(matches)} sections with strikethrough text.")
-    if not click.confirm("Do you want to separate this content into the secret repository?", default=True):
-        return content, None
+def stage_changes(repo, repo_path):
+    """Stages the planned paths of repo_path, or everything if nothing was planned."""
+    paths = take_planned_paths(repo_path)
+    if paths is None:
+        repo.git.add(A=True)
+        return
+    existing = [path for path in paths if os.path.lexists(os.path.join(repo_path, path))]
+    missing = [path for path in paths if path not in existing]
+    if existing:
+        repo.git.add("-A", "--", *existing)
+    if missing:
+        # `git add` fails on a pathspec that matches nothing, so deletions go through rm.
+        repo.git.rm("-r", "-q", "--cached", "--ignore-unmatch", "--", *missing)
 
-    secret_content = {}
-    clean_content = content
-    
-    for match in reversed(matches):
-        original_text = match.group(0) # e.g., ~~secret text~~
-        inner_text = match.group(1)    # e.g., secret text
-        
-        # We use a hash of the original text to create a unique ID
-        content_hash = hashlib.sha256(original_text.encode('utf-8')).hexdigest()
-        
-        # Store the original markdown (including the ~~ markers)
-        secret_content[content_hash] = original_text
-        
-        # Replace with a placeholder span
-        placeholder = f'<span class="secret-placeholder" data-id="{content_hash}" title-hash="{title_hash}"></span>'
-        
-        # Replace the content from the end to the beginning to not mess up indices
-        start, end = match.span()
-        clean_content = clean_content[:start] + placeholder + clean_content[end:]
+def commit_local(repo_path, message):
+    """
+    Stages the planned changes and commits them without pushing. Returns the
+    previous HEAD commit (None for an empty repo), or False if there was nothing
+    to commit.
+    """
+    import git
 
-    click.echo("Separated secret content and replaced with placeholders.")
-    return clean_content, secret_content
+    repo = git.Repo(repo_path)
+    stage_changes(repo, repo_path)
+    previous_head = repo.head.commit.hexsha if repo.head.is_valid() else None
+    if previous_head and not repo.index.diff(previous_head):
+        # A commit left behind by an earlier failed push still needs pushing.
+        return previous_head if has_unpushed_commits(repo) else False
+    repo.index.commit(message)
+    return previous_head
 
-# --- CLI Commands ---
+def has_unpushed_commits(repo):
+    """Returns True if the current branch is ahead of its upstream."""
+    import git
 
-@click.group()
-def cli():
-    """A CLI tool to manage your Hugo blog posts."""
-    check_hugo_installed()
-    pass
+    try:
+        return int(repo.git.rev_list("--count", "@{u}..HEAD")) > 0
+    except (git.GitCommandError, ValueError):
+        return False
 
-@cli.command()
-@click.argument('filepath', type=click.Path(exists=True))
-@click.option('--type', 'content_type', default='post', help='The type of content to create (e.g., post, thought).')
-def new(filepath, content_type):
-    """Create a new blog post from a file."""
-    if content_type not in ['post', 'thought']:
-        click.echo(f"Invalid content type '{content_type}'. Please use 'post' or 'thought'.", err=True)
-        return
-    temp_dir = get_temp_dir()
-    content_path = os.path.join("content", content_type)
-    secret_repo_dir = get_secret_repo_dir() # Ensure secret repo is ready
+@traced("push")
+def push_repo(repo_path):
+    """Pushes the current branch, raising if the remote rejected any ref."""
+    import git
 
-    # 0. Preprocess the markdown file to upload images
-    click.echo("Preprocessing markdown file...")
-    with open(filepath, "r", encoding='utf-8') as f_src:
-        original_content = f_src.read()
-    
-    source_dir = os.path.dirname(os.path.abspath(filepath))
-    content = preprocess_markdown_content(original_content, source_dir)
-    
-    # 1. Create a new post using Hugo
-    click.echo(f"Creating new {content_type} with Hugo...")
-    post_dir_name = "untitled-post"
-    new_post_path = os.path.join(temp_dir, content_path, post_dir_name)
-    
-    # Hugo command needs to be run from within the repo directory
-    original_cwd = os.getcwd()
-    os.chdir(temp_dir)
-    os.system(f'hugo new {content_type}/{post_dir_name}/index.md')
-    os.chdir(original_cwd)
+    repo = git.Repo(repo_path)
+    repo.remotes.origin.push().raise_if_error()
+    record_sync(repo_path, repo.head.commit.hexsha)
 
-    # 2. Append content from the source file
-    index_md_path = os.path.join(new_post_path, "index.md")
-    with open(index_md_path, "a", encoding='utf-8') as f_dest:
-        f_dest.write("\n" + content)
-        
-    click.echo(f"Content from {filepath} has been added.")
-    
-    # 3. Open with Typora
-    open_with_typora(index_md_path)
-    click.echo(f"Please edit the post file to set the headers: {index_md_path}")
-    
-    # 4. Prompt user to confirm after editing
-    if not click.confirm("Have you finished editing and set the headers?"):
-        click.echo("Aborted.")
-        # Clean up the created directory
-        shutil.rmtree(new_post_path)
-        return
+def discard_local_changes(repo_path):
+    """
+    Throws away the changes this run planned in repo_path, e.g. secrets written
+    for a post that was aborted. Anything else in the shared checkout, such as
+    the draft of a pending journaled post, is left alone.
+    """
+    import git
 
-    # 5. Read the title and process secret content
-    with open(index_md_path, "r", encoding='utf-8') as f:
-        full_content_string = f.read()
-    
-    post = frontmatter.loads(full_content_string)
-    title = post.metadata.get("title", "")
-    
-    if not title:
-        click.echo("Could not find title in the markdown file. Aborting.", err=True)
-        shutil.rmtree(new_post_path)
+    paths = take_planned_paths(repo_path)
+    if not paths:
         return
-    
-    title_hash = hashlib.sha256(str(title).encode('utf-8')).hexdigest()
-    clean_content, secret_content = process_strikethrough_content(title_hash,post.content)
-    
-    if secret_content:
-        # --- Hybrid Encryption (RSA + AES-CBC) ---
-        public_key = get_or_setup_public_key()
-        
-        # 1. Generate a one-time AES session key
-        session_key = get_random_bytes(16) # 128-bit key
-        
-        # 2. Encrypt the data with AES-CBC
-        cipher_aes = AES.new(session_key, AES.MODE_CBC)
-        iv = cipher_aes.iv
-        data_to_encrypt = json.dumps(secret_content).encode('utf-8')
-        
-        # Pad the data to be a multiple of the block size using PKCS7
-        padded_data = pad(data_to_encrypt, AES.block_size)
-        ciphertext = cipher_aes.encrypt(padded_data)
-        
-        # 3. Encrypt the AES session key with RSA
-        cipher_rsa = PKCS1_v1_5.new(public_key)
-        encrypted_session_key = cipher_rsa.encrypt(base64.b64encode(session_key))
-        
-        # 4. Prepare payload for storage
-        payload = {
-            'encrypted_session_key': base64.b64encode(encrypted_session_key).decode('utf-8'),
-            'iv': base64.b64encode(iv).decode('utf-8'),
-            'ciphertext': base64.b64encode(ciphertext).decode('utf-8')
-        }
-        
-        secret_filename = f"{title_hash}.json"
-        secret_filepath = os.path.join(secret_repo_dir, secret_filename)
-        
-        with open(secret_filepath, 'w') as f:
-            json.dump(payload, f)
-        
-        click.echo(f"Secret content encrypted and saved to {secret_filepath}")
-        
-        # Commit and push the secret content
-        commit_and_push(secret_repo_dir, f"Add secret for post: {title}")
-        
-        # Update the main post file with the clean content, preserving original frontmatter
-        parts = full_content_string.split('---', 2)
-        if len(parts) >= 3:
-            raw_frontmatter = parts[1]
-            new_full_content = f"---{raw_frontmatter}---\n{clean_content}"
-            with open(index_md_path, 'w', encoding='utf-8') as f:
-                f.write(new_full_content)
-        else:
-            # Fallback to original method if splitting fails
-            post.content = clean_content
-            with open(index_md_path, 'w', encoding='utf-8') as f:
-                f.write(frontmatter.dumps(post))
+    repo = git.Repo(repo_path)
+    if repo.head.is_valid():
+        tracked = repo.git.ls_tree("--name-only", "HEAD", "--", *paths).splitlines()
+        if tracked:
+            repo.git.checkout("HEAD", "--", *tracked)
+    # Files this run created below the planned paths are untracked; drop just those.
+    repo.git.clean("-fdq", "--", *paths)
+    # Directories created for them are left empty, and an empty post directory still looks like a post.
+    root = os.path.abspath(repo_path)
+    for path in paths:
+        directory = os.path.dirname(os.path.join(root, path))
+        while directory != root and os.path.isdir(directory) and not os.listdir(directory):
+            os.rmdir(directory)
+            directory = os.path.dirname(directory)
 
-    # 6. Read the title and rename the directory
-    title = ""
-    with open(index_md_path, "r", encoding='utf-8') as f:
-        for line in f:
-            if line.lower().startswith("title:"):
-                title = line.split(":", 1)[1].strip().replace('"', '').replace("'", "")
-                break
-    
-    if not title:
-        click.echo("Could not find title in the markdown file. Aborting.", err=True)
-        shutil.rmtree(new_post_path)
-        return
+def reset_to_upstream(repo_path):
+    """
+    Drops commits that were never pushed, keeping unrelated local edits, so the
+    next pull fast-forwards.
+    """
+    import git
 
-    # Sanitize title to be a valid directory name
-    safe_title = slugify(title)
-    final_post_path = os.path.join(temp_dir, content_path, safe_title)
+    repo = git.Repo(repo_path)
+    if has_unpushed_commits(repo):
+        repo.git.reset("--keep", "@{u}")
 
-    if os.path.exists(final_post_path):
-        if not click.confirm(f"Post '{safe_title}' already exists. Overwrite?"):
-            click.echo("Aborted.")
-            shutil.rmtree(new_post_path)
-            return
-        shutil.rmtree(final_post_path)
+def rollback_secret_commit(secret_repo_dir, previous_head, pushed):
+    """Undoes a secret commit whose post could not be published."""
+    import git
 
-    os.rename(new_post_path, final_post_path)
-    click.echo(f"Post renamed to '{safe_title}'.")
+    repo = git.Repo(secret_repo_dir)
+    if not pushed:
+        # The commit never left this machine, so it can simply be dropped.
+        if previous_head:
+            repo.git.reset("--hard", previous_head)
+        return
+    # Others may already have fetched it, so revert instead of rewriting history.
+    message = f"Revert \"{repo.head.commit.summary}\"\n\nThe matching blog push failed."
+    try:
+        repo.git.revert("--no-commit", "HEAD")
+    except git.GitCommandError:
+        repo.git.reset("--hard", "HEAD")
+        raise
+    repo.index.commit(message)
+    push_repo(secret_repo_dir)
 
-    # 7. Run hugo, commit and push
-    click.echo("Running hugo build...")
-    os.chdir(temp_dir)
-    os.system('hugo')
-    os.chdir(original_cwd)
-    
-    commit_and_push(temp_dir, f"Add new post: {title}")
+@traced("publish_changes")
+def publish_changes(temp_dir, message, secret_repo_dir=None, secret_message=None, journal=None):
+    """
+    Commits the blog repo (and, if given, the secret repo) and pushes both
+    concurrently. If the blog push fails, the blog commit is dropped and the
+    secret commit is rolled back (reverted if it was already pushed), so no
+    secret is left without its post and no later push publishes the post.
+    With a publish journal, the commits are recorded in it and it is finished
+    once everything is pushed.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+    import git
 
-@cli.command()
-@click.argument('name')
-@click.option('--type', 'content_type', default='post', help='The type of content to remove (e.g., post, thought).')
-def remove(name, content_type):
-    """Remove a blog post by its folder name."""
-    if content_type not in ['post', 'thought']:
-        click.echo(f"Invalid content type '{content_type}'. Please use 'post' or 'thought'.", err=True)
+    try:
+        main_previous = commit_local(temp_dir, message)
+        secret_previous = commit_local(secret_repo_dir, secret_message) if secret_repo_dir else False
+    except Exception as e:
+        click.echo(f"Error during git operation: {e}", err=True)
+        sys.exit(1)
+    journal_stage(journal, "commit", **{
+        name: git.Repo(path).head.commit.hexsha
+        for name, path, previous in (("main", temp_dir, main_previous), ("secret", secret_repo_dir, secret_previous))
+        if previous is not False
+    })
+
+    if get_runtime_options().get("offline"):
+        click.echo("Offline mode: changes committed locally, push skipped.")
+        finish_journal(journal)
         return
-    name = slugify(name)
-    temp_dir = get_temp_dir()
-    content_path = os.path.join("content", content_type)
-    post_path = os.path.join(temp_dir, content_path, name)
 
-    if not os.path.exists(post_path):
-        click.echo(f"Error: Post '{name}' not found.", err=True)
+    targets = {}
+    if main_previous is not False:
+        targets["main"] = temp_dir
+    if secret_previous is not False:
+        targets["secret"] = secret_repo_dir
+    if not targets:
+        click.echo("Nothing to commit.")
+        finish_journal(journal)
         return
 
-    if click.confirm(f"Are you sure you want to delete the post '{name}'?"):
-        shutil.rmtree(post_path)
-        click.echo(f"Post '{name}' has been deleted.")
-        
-        # Run hugo, commit and push
-        click.echo("Running hugo build...")
-        original_cwd = os.getcwd()
-        os.chdir(temp_dir)
-        os.system('hugo')
-        os.chdir(original_cwd)
-        
-        commit_and_push(temp_dir, f"Remove post: {name}")
-    else:
-        click.echo("Aborted.")
+    errors = {}
+    with ThreadPoolExecutor(max_workers=len(targets)) as executor:
+        futures = {name: executor.submit(inherit_trace(push_repo), path) for name, path in targets.items()}
+        for name, future in futures.items():
+            try:
+                future.result()
+            except Exception as e:
+                errors[name] = e
 
-@cli.command(name="list")
-@click.option('--type', 'content_type', default=None, help='The type of content to list (e.g., post, thought). Lists all types if not specified.')
-def list_posts(content_type):
-    """List all available blog posts in a table."""
-    temp_dir = get_temp_dir()
-    
-    content_types_to_list = ['post', 'thought']
-    if content_type:
-        if content_type in content_types_to_list:
-            content_types_to_list = [content_type]
+    if "main" in errors:
+        click.echo(f"Error pushing the repository: {errors['main']}", err=True)
+        if "secret" in targets:
+            try:
+                rollback_secret_commit(secret_repo_dir, secret_previous, pushed="secret" not in errors)
+                click.echo("The secret commit has been rolled back.", err=True)
+            except Exception as e:
+                click.echo(f"Failed to roll back the secret commit: {e}", err=True)
+        # Otherwise the next push from this checkout, e.g. by `remove`, would publish the post after all.
+        try:
+            reset_to_upstream(temp_dir)
+        except Exception as e:
+            click.echo(f"Failed to drop the local commit: {e}", err=True)
+        if journal is not None:
+            journal["stages"].pop("commit", None)
+            save_journal(journal)
         else:
-            click.echo(f"Invalid content type '{content_type}'. Please use 'post' or 'thought'.", err=True)
-            return
+            click.echo("The local commit has been dropped; run the command again to retry.", err=True)
+        sys.exit(1)
+    if "secret" in errors:
+        # The post is live, so keep the secret commit; the next push will carry it.
+        click.echo(f"Error pushing the secret repository: {errors['secret']}", err=True)
+        click.echo("The secret commit is kept locally and will be pushed with the next change.", err=True)
+        sys.exit(1)
+    journal_stage(journal, "push")
+    finish_journal(journal)
+    click.echo("Changes committed and pushed successfully.")
 
-    table = Table(title="Blog Content")
-    table.add_column("Title", style="cyan", no_wrap=True)
-    table.add_column("Type", style="blue")
-    table.add_column("Date", style="magenta")
-    table.add_column("Tags", style="green")
-    table.add_column("Word Count", justify="right", style="yellow")
+PICGO_URL = "http://127.0.0.1:36677/upload"
+DEFAULT_UPLOAD_BATCH_SIZE = 5
+DEFAULT_UPLOAD_CONCURRENCY = 4
+DEFAULT_UPLOAD_RETRIES = 2
 
-    found_content = False
-    for c_type in content_types_to_list:
-        content_dir = os.path.join(temp_dir, "content", c_type)
-        
-        if not os.path.exists(content_dir):
-            continue
-            
-        items = [d for d in os.listdir(content_dir) if os.path.isdir(os.path.join(content_dir, d))]
-        
-        if items:
-            found_content = True
+def get_image_cache_path():
+    """Returns the path to the cache mapping image content hashes to uploaded URLs."""
+    home_dir = os.path.expanduser("~")
+    return os.path.join(home_dir, ".blog_uploader", "image_cache.json")
 
-        for item_name in sorted(items):
-            index_path = os.path.join(content_dir, item_name, "index.md")
-            if os.path.exists(index_path):
-                try:
-                    with open(index_path, 'r', encoding='utf-8') as f:
-                        post = frontmatter.load(f)
-                        
-                    title = str(post.metadata.get('title', 'N/A'))
-                    date_obj = post.metadata.get('date')
-                    date_str = 'N/A'
-                    if isinstance(date_obj, (datetime.date, datetime.datetime)):
-                        date_str = date_obj.strftime('%Y-%m-%d')
-                    elif date_obj:
-                        date_str = str(date_obj)
-
-                    tags = post.metadata.get('categories')
-                    tags_str = "N/A"
-                    if isinstance(tags, builtins.list):
-                        tags_str = ", ".join(str(tag) for tag in tags)
-                    elif tags:
-                        tags_str = str(tags)
-                    
-                    word_count = len(post.content)
-                    
-                    table.add_row(title, c_type, date_str, tags_str, str(word_count))
-                except Exception as e:
-                    table.add_row(f"[red]Error parsing {item_name}[/red]", c_type, str(e), "", "")
+def load_image_cache():
+    """Loads the image upload cache."""
+    cache_path = get_image_cache_path()
+    if os.path.exists(cache_path):
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            pass
+    return {}
 
-    if not found_content:
-        click.echo("No content found.")
-        return
+def save_image_cache(cache):
+    """Saves the image upload cache."""
+    write_json_atomic(get_image_cache_path(), cache)
 
-    console = Console()
-    console.print(table)
+def hash_file(path):
+    """Returns the SHA-256 hex digest of a file's contents."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+UPLOAD_SESSIONS = {}
+UPLOAD_SESSIONS_LOCK = threading.Lock()
+BUILTIN_IMAGE_SERVER = {}
+
+def get_upload_session(pool_size):
+    """
+    Returns a requests session shared by all uploads of this process, with a
+    connection pool large enough for pool_size parallel requests, so batches
+    reuse their keep-alive connections instead of reconnecting.
+    """
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    with UPLOAD_SESSIONS_LOCK:
+        session = UPLOAD_SESSIONS.get(pool_size)
+        if session is None:
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+            session.mount("http://", adapter)
+            session.mount("https://", adapter)
+            UPLOAD_SESSIONS[pool_size] = session
+        return session
+
+def get_picgo_url(config):
+    """
+    Returns the upload URL to use. With "image_store" configured, the built-in
+    PicGo-compatible server is started in this process for it, so no external
+    PicGo is needed (e.g. when publishing from CI).
+    """
+    store_settings = config.get("image_store")
+    if not store_settings:
+        return config.get("picgo_url", PICGO_URL)
+    with UPLOAD_SESSIONS_LOCK:
+        if "url" not in BUILTIN_IMAGE_SERVER:
+            from . import image_server
+            try:
+                server = image_server.start_image_server(store_settings)
+            except (OSError, TypeError, ValueError) as e:
+                click.echo(f"Error: Could not start the built-in image server: {e}", err=True)
+                sys.exit(1)
+            BUILTIN_IMAGE_SERVER["url"] = image_server.get_upload_url(server)
+        return BUILTIN_IMAGE_SERVER["url"]
+
+def request_picgo_upload(image_paths, url=PICGO_URL, session=None, multipart=False):
+    """
+    Sends one upload request to the PicGo server and returns the URLs, raising on failure.
+    With multipart, the file contents are sent instead of their local paths, so the
+    server does not need to see this machine's filesystem.
+    """
+    import requests
+
+    session = session or requests
+    if multipart:
+        import mimetypes
+        with contextlib.ExitStack() as stack:
+            files = [
+                ("files", (os.path.basename(path), stack.enter_context(open(path, 'rb')),
+                           mimetypes.guess_type(path)[0] or "application/octet-stream"))
+                for path in image_paths
+            ]
+            response = session.post(url, files=files)
+    else:
+        # PicGo's API expects a JSON payload with a 'list' of file paths
+        response = session.post(url, json={"list": image_paths})
+    response.raise_for_status()
+    result = response.json()
+    if not result.get("success"):
+        raise RuntimeError(f"PicGo API Error: {result.get('message', 'Unknown error')}")
+    urls = result.get("result", [])
+    if len(urls) != len(image_paths):
+        raise RuntimeError(f"PicGo returned {len(urls)} URLs for {len(image_paths)} images.")
+    return urls
+
+@traced("upload_images_with_picgo")
+def upload_images_with_picgo(image_paths):
+    """
+    Uploads images using the PicGo server API.
+    Images are sent in small batches over a bounded thread pool sharing one
+    pooled session, and each batch is retried with backoff. Returns the URLs in
+    input order, or [] on failure.
+    """
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    from rich.progress import Progress
+    import requests
 
-@cli.command(name="show-private-key")
-def show_private_key():
-    """Displays the configured private key required for decryption."""
     config = load_config()
-    private_key_path = config.get("private_key_path")
+    url = get_picgo_url(config)
+    batch_size = max(1, config.get("upload_batch_size", DEFAULT_UPLOAD_BATCH_SIZE))
+    concurrency = max(1, config.get("upload_concurrency", DEFAULT_UPLOAD_CONCURRENCY))
+    retries = max(0, config.get("upload_retries", DEFAULT_UPLOAD_RETRIES))
+    multipart = config.get("upload_mode", "paths") == "multipart"
+    session = get_upload_session(concurrency)
 
-    if not private_key_path or not os.path.exists(private_key_path):
-        click.echo(click.style("Private key path is not configured or the file is missing.", fg="red"))
+    batches = [image_paths[i:i + batch_size] for i in range(0, len(image_paths), batch_size)]
+
+    def upload_batch(batch):
+        for attempt in range(retries + 1):
+            try:
+                return request_picgo_upload(batch, url, session, multipart)
+            except (requests.exceptions.RequestException, RuntimeError, ValueError):
+                if attempt == retries:
+                    raise
+                time.sleep(2 ** attempt)
+
+    results = [None] * len(batches)
+    failed = False
+    with Progress(transient=True) as progress:
+        task = progress.add_task("Uploading images", total=len(image_paths))
+        with ThreadPoolExecutor(max_workers=min(concurrency, len(batches)) or 1) as executor:
+            futures = {executor.submit(inherit_trace(upload_batch), batch): i for i, batch in enumerate(batches)}
+            for future in as_completed(futures):
+                i = futures[future]
+                try:
+                    results[i] = future.result()
+                except requests.exceptions.RequestException as e:
+                    click.echo(f"Failed to connect to PicGo server at {url}. Is it running?", err=True)
+                    click.echo(f"Error: {e}", err=True)
+                    failed = True
+                except (RuntimeError, ValueError) as e:
+                    click.echo(str(e), err=True)
+                    failed = True
+                progress.advance(task, len(batches[i]))
+
+    if failed:
+        return []
+    return [image_url for batch_urls in results for image_url in batch_urls]
+
+# --- Image Optimization ---
+# Before upload, raster images are downscaled to a maximum width and re-encoded
+# in their own format and as WebP (plus AVIF if configured); the smallest result
+# is uploaded instead of the original. Results are cached by the SHA-256 of the
+# source file, so an unchanged image is never encoded twice. Needs Pillow
+# (pip install blog-uploader[images]); without it images are uploaded as-is.
+
+OPTIMIZABLE_EXTENSIONS = {'.png', '.jpg', '.jpeg', '.webp', '.bmp', '.tif', '.tiff'}
+DEFAULT_IMAGE_MAX_WIDTH = 1600
+DEFAULT_IMAGE_QUALITY = 82
+DEFAULT_IMAGE_FORMATS = ["webp"]
+
+def get_optimized_images_dir():
+    """Returns the directory holding optimized copies of uploaded images."""
+    home_dir = os.path.expanduser("~")
+    return os.path.join(home_dir, ".blog_uploader", "optimized_images")
+
+def get_image_settings():
+    """Returns the image optimization settings from the config, or None if it is disabled."""
+    config = load_config()
+    if not config.get("optimize_images", True):
+        return None
+    return {
+        "max_width": config.get("image_max_width", DEFAULT_IMAGE_MAX_WIDTH),
+        "quality": config.get("image_quality", DEFAULT_IMAGE_QUALITY),
+        "formats": config.get("image_formats", DEFAULT_IMAGE_FORMATS),
+    }
+
+def optimize_image(source_path, source_hash, settings):
+    """
+    Resizes and re-encodes one image and returns the path of the smallest
+    variant, or source_path if nothing beat the original. Runs in a worker process.
+    """
+    from PIL import Image, ImageOps
+
+    out_dir = os.path.join(get_optimized_images_dir(), source_hash[:2])
+    os.makedirs(out_dir, exist_ok=True)
+
+    with Image.open(source_path) as original:
+        if getattr(original, "is_animated", False):
+            return source_path
+        source_format = original.format
+        image = ImageOps.exif_transpose(original)
+        resized = image.width > settings["max_width"]
+        if resized:
+            height = round(image.height * settings["max_width"] / image.width)
+            image = image.resize((settings["max_width"], height), Image.LANCZOS)
+
+        candidates = []
+        if source_format in ("PNG", "JPEG"):
+            path = os.path.join(out_dir, f"{source_hash}.{source_format.lower()}")
+            if source_format == "PNG":
+                image.save(path, "PNG", optimize=True)
+            else:
+                image.save(path, "JPEG", quality=settings["quality"], optimize=True, progressive=True)
+            candidates.append(path)
+        for image_format in settings["formats"]:
+            path = os.path.join(out_dir, f"{source_hash}.{image_format.lower()}")
+            try:
+                image.save(path, image_format.upper(), quality=settings["quality"])
+            except (KeyError, OSError, ValueError):
+                continue # Pillow was built without this encoder.
+            candidates.append(path)
+
+    if not candidates:
+        return source_path
+    best = min(candidates, key=os.path.getsize)
+    if not resized and os.path.getsize(best) >= os.path.getsize(source_path):
+        best = source_path
+    for path in candidates:
+        if path != best:
+            os.remove(path)
+    return best
+
+@traced("optimize_images")
+def optimize_images(path_hashes):
+    """Maps each source image path to the (possibly optimized) file that should be uploaded."""
+    from concurrent.futures import ProcessPoolExecutor
+
+    settings = get_image_settings()
+    if settings is None:
+        return {path: path for path in path_hashes}
+    try:
+        import PIL
+    except ImportError:
+        click.echo(click.style("Pillow is not installed, uploading images without optimization.", fg="yellow"))
+        return {path: path for path in path_hashes}
+
+    cache_path = os.path.join(get_optimized_images_dir(), "index.json")
+    cache = {}
+    if os.path.exists(cache_path):
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            cache = {}
+
+    settings_key = hashlib.sha256(json.dumps(settings, sort_keys=True).encode('utf-8')).hexdigest()[:12]
+    def cache_key(digest):
+        return f"{digest}:{settings_key}"
+
+    pending = {}
+    for path, digest in path_hashes.items():
+        if os.path.splitext(path)[1].lower() not in OPTIMIZABLE_EXTENSIONS:
+            continue
+        cached = cache.get(cache_key(digest))
+        if cached and (cached == "original" or os.path.exists(cached)):
+            continue
+        pending.setdefault(digest, path)
+
+    if pending:
+        click.echo(f"Optimizing {len(pending)} images...")
+        jobs = [(path, digest, settings) for digest, path in pending.items()]
+        results = []
+        with contextlib.ExitStack() as stack:
+            if len(jobs) == 1:
+                # Not worth starting a process pool for a single image.
+                calls = [functools.partial(optimize_image, *jobs[0])]
+            else:
+                executor = stack.enter_context(ProcessPoolExecutor())
+                calls = [executor.submit(optimize_image, *job).result for job in jobs]
+            for (path, _, _), call in zip(jobs, calls):
+                try:
+                    results.append(call())
+                except Exception as e:
+                    click.echo(click.style(f"Warning: Could not optimize {path}: {e}", fg="yellow"))
+                    results.append(None)
+        saved = 0
+        for (path, digest, _), result in zip(jobs, results):
+            if result is None:
+                # Not cached, so the image is tried again next time instead of being uploaded as is for good.
+                continue
+            cache[cache_key(digest)] = "original" if result == path else result
+            if result != path:
+                saved += os.path.getsize(path) - os.path.getsize(result)
+        write_json_atomic(cache_path, cache)
+        click.echo(f"Image optimization saved {saved / 1024:.0f} KiB.")
+
+    optimized = {}
+    for path, digest in path_hashes.items():
+        cached = cache.get(cache_key(digest))
+        optimized[path] = cached if cached and cached != "original" else path
+    return optimized
+
+def upload_images(image_paths):
+    """
+    Uploads images that have not been uploaded before and returns a map of
+    path -> remote URL. Images are optimized first, and identical files
+    (by SHA-256) are only uploaded once.
+    """
+    cache = load_image_cache()
+    source_hashes = {path: hash_file(path) for path in image_paths}
+    upload_paths = optimize_images(source_hashes)
+    path_hashes = {
+        path: source_hashes[path] if upload_paths[path] == path else hash_file(upload_paths[path])
+        for path in image_paths
+    }
+
+    pending = {}
+    for path, digest in path_hashes.items():
+        if digest not in cache and digest not in pending:
+            pending[digest] = upload_paths[path]
+
+    if pending:
+        click.echo(f"Uploading {len(pending)} new images ({len(path_hashes) - len(pending)} reused from cache or duplicates).")
+        uploaded_urls = upload_images_with_picgo(builtins.list(pending.values()))
+        if not uploaded_urls:
+            return None
+        cache.update(zip(pending.keys(), uploaded_urls))
+        save_image_cache(cache)
+    else:
+        click.echo("All images have been uploaded before, reusing cached URLs.")
+
+    return {path: cache[digest] for path, digest in path_hashes.items()}
+
+# --- Markdown Rewriting ---
+
+# A backtick fence's info string may not contain backticks, so "```py```" is inline code.
+FENCE_OPEN_PATTERN = re.compile(r'(?:(`{3,})(?=[^`]*$)|(~{3,}))')
+QUOTE_PREFIX_PATTERN = re.compile(r'(?: {0,3}> ?)*')
+LIST_ITEM_PATTERN = re.compile(r'[ \t]*(?:[-+*]|\d{1,9}[.)])(?: {1,4}(?! )|\t|(?=\r?\n|$))')
+INLINE_TRIGGER_PATTERN = re.compile(r'\\[!-/:-@\[-`{-~]|`+|!\[|~~')
+STRIKE_SCAN_PATTERN = re.compile(r'`+|~~')
+BACKTICK_RUN_PATTERN = re.compile(r'`+')
+REMOTE_URL_PATTERN = re.compile(r'https?://')
+FRONTMATTER_PATTERN = re.compile(r'\A---[ \t]*\r?\n(.*?)\r?\n---[ \t]*(?:\r?\n|\Z)', re.DOTALL)
+
+def split_frontmatter(text):
+    """Splits a markdown file into its raw YAML frontmatter (or None) and its body."""
+    match = FRONTMATTER_PATTERN.match(text)
+    if not match:
+        return None, text
+    return match.group(1), text[match.end():]
+
+def find_code_span_end(text, start, ticks):
+    """Returns the end of the code span opened by `ticks` backticks at start, or -1."""
+    pos = start + ticks
+    while True:
+        match = BACKTICK_RUN_PATTERN.search(text, pos)
+        if not match:
+            return -1
+        if len(match.group(0)) == ticks:
+            return match.end()
+        pos = match.end()
+
+def tokenize_inline(text, tokens):
+    """Splits a run of non-fenced markdown into text, code, image and strikethrough tokens."""
+    pos = 0
+    last = 0
+    while True:
+        match = INLINE_TRIGGER_PATTERN.search(text, pos)
+        if not match:
+            break
+        start = match.start()
+        trigger = match.group(0)
+        token = None
+
+        if trigger[0] == "\\":
+            pos = match.end() # Escaped character, keep it literal.
+            continue
+        elif trigger[0] == "`":
+            end = find_code_span_end(text, start, len(trigger))
+            if end == -1:
+                pos = match.end()
+                continue
+            token = ("code", text[start:end])
+        elif trigger == "![":
+            # Same shape as the old ![alt](path) regex: alt and path stay on one line.
+            line_end = text.find("\n", start)
+            if line_end == -1:
+                line_end = len(text)
+            alt_end = text.find("](", start + 2, line_end)
+            path_end = text.find(")", alt_end + 2, line_end) if alt_end != -1 else -1
+            if path_end == -1:
+                pos = match.end()
+                continue
+            end = path_end + 1
+            token = ("image", text[start:end], text[start + 2:alt_end], text[alt_end + 2:path_end])
+        else:
+            # ~~...~~ may span lines, but never closes inside an inline code span.
+            scan = start + 3
+            end = -1
+            while True:
+                inner = STRIKE_SCAN_PATTERN.search(text, scan)
+                if not inner:
+                    break
+                if inner.group(0) == "~~":
+                    end = inner.end()
+                    break
+                code_end = find_code_span_end(text, inner.start(), len(inner.group(0)))
+                scan = code_end if code_end != -1 else inner.end()
+            if end == -1:
+                pos = match.end()
+                continue
+            inner_tokens = []
+            tokenize_inline(text[start + 2:end - 2], inner_tokens)
+            token = ("strike", text[start:end], inner_tokens)
+
+        if start > last:
+            tokens.append(("text", text[last:start]))
+        tokens.append(token)
+        pos = last = end
+
+    if last < len(text):
+        tokens.append(("text", text[last:]))
+
+def tokenize_markdown(content):
+    """
+    Tokenizes a markdown body in one linear pass. Fenced and indented code
+    blocks (also inside blockquotes and list items) and inline code spans
+    become opaque "code" tokens, so images and ~~secrets~~ inside them are
+    never touched.
+    """
+    tokens = []
+    chunk = []
+    code = []
+    fence = None        # (fence characters, quote depth, content column) of the open fence
+    indented = None     # (quote depth, content column) of the open indented code block
+    list_columns = []   # content columns of the open list items, innermost last
+    in_paragraph = False
+
+    def flush_chunk():
+        if chunk:
+            tokenize_inline("".join(chunk), tokens)
+            chunk.clear()
+
+    def flush_code():
+        if code:
+            tokens.append(("code", "".join(code)))
+            code.clear()
+
+    for line in content.splitlines(keepends=True):
+        quote = QUOTE_PREFIX_PATTERN.match(line).group(0)
+        depth = quote.count(">")
+        rest = line[len(quote):]
+        blank = not rest.strip()
+        indent = len(rest.expandtabs(4)) - len(rest.expandtabs(4).lstrip(" "))
+
+        # A code block ends with its container: the blockquote it opened in, or
+        # the list item whose content column it no longer reaches.
+        if fence and (depth < fence[1] or (not blank and indent < fence[2])):
+            flush_code()
+            fence = None
+        if indented and not blank and (depth != indented[0] or indent < indented[1] + 4):
+            flush_code()
+            indented = None
+            in_paragraph = False
+
+        if fence:
+            code.append(line)
+            closing = rest.strip()
+            if (indent - fence[2] <= 3 and len(closing) >= len(fence[0])
+                    and closing == fence[0][0] * len(closing)):
+                flush_code()
+                fence = None
+            continue
+        if indented:
+            code.append(line)
+            continue
+
+        if blank:
+            chunk.append(line)
+            in_paragraph = False
+            continue
+
+        item = LIST_ITEM_PATTERN.match(rest)
+        # A less indented line ends list items, unless it lazily continues a paragraph.
+        if item or not in_paragraph:
+            while list_columns and indent < list_columns[-1]:
+                list_columns.pop()
+        column = list_columns[-1] if list_columns else 0
+        if indent - column >= 4:
+            if not in_paragraph:
+                flush_chunk()
+                code.append(line)
+                indented = (depth, column)
+                continue
+            item = None
+
+        body = rest.lstrip(" \t")
+        if item:
+            list_columns.append(len(item.group(0).expandtabs(4)))
+            column = list_columns[-1]
+            body = rest[len(item.group(0)):].lstrip(" \t")
+        opener = FENCE_OPEN_PATTERN.match(body) if indent - column <= 3 or item else None
+        if opener:
+            flush_chunk()
+            code.append(line)
+            fence = (opener.group(1) or opener.group(2), depth, column)
+            in_paragraph = False
+            continue
+
+        chunk.append(line)
+        in_paragraph = True
+
+    flush_chunk()
+    # An unclosed fence runs to the end of the document.
+    flush_code()
+    return tokens
+
+def iter_tokens(tokens):
+    """Yields every token, including the ones nested inside strikethrough spans."""
+    for token in tokens:
+        yield token
+        if token[0] == "strike":
+            yield from iter_tokens(token[2])
+
+def secret_placeholder(content_hash, title_hash):
+    """Returns the placeholder span that replaces a secret in the published post."""
+    return f'<span class="secret-placeholder" data-id="{content_hash}" title-hash="{title_hash}"></span>'
+
+def render_markdown_tokens(tokens, path_to_url_map=None, title_hash=None):
+    """
+    Joins tokens back into markdown, swapping local image paths for their
+    remote URLs and, if title_hash is given, secrets for placeholders.
+    Returns the new markdown and the {content_hash: markdown} secret map.
+    """
+    pieces = []
+    secret_content = {}
+    for token in tokens:
+        kind, raw = token[0], token[1]
+        if kind == "image" and path_to_url_map:
+            remote_url = path_to_url_map.get(token[3])
+            if remote_url:
+                raw = f'![{token[2]}]({remote_url})'
+        elif kind == "strike":
+            if path_to_url_map:
+                inner, _ = render_markdown_tokens(token[2], path_to_url_map)
+                raw = f"~~{inner}~~"
+            if title_hash is not None:
+                # We use a hash of the original text (including the ~~ markers) to create a unique ID
+                content_hash = hashlib.sha256(raw.encode('utf-8')).hexdigest()
+                secret_content[content_hash] = raw
+                raw = secret_placeholder(content_hash, title_hash)
+        pieces.append(raw)
+    return "".join(pieces), secret_content
+
+def rewrite_markdown(content, path_to_url_map=None, title_hash=None):
+    """Replaces images and (optionally) secrets in a markdown body in a single pass."""
+    return render_markdown_tokens(tokenize_markdown(content), path_to_url_map, title_hash)
+
+def find_local_images(content, base_dir):
+    """Returns a map of each local image path in content -> its absolute path on disk."""
+    original_to_absolute = {}
+    
+    for token in iter_tokens(tokenize_markdown(content)):
+        if token[0] != "image" or REMOTE_URL_PATTERN.match(token[3]):
+            continue
+        image_path = token[3]
+        
+        abs_path = image_path
+        if not os.path.isabs(abs_path):
+            abs_path = os.path.abspath(os.path.join(base_dir, image_path))
+        
+        if os.path.exists(abs_path):
+            original_to_absolute[image_path] = abs_path
+        else:
+            click.echo(click.style(f"Warning: Image not found at {abs_path}", fg="yellow"))
+
+    return original_to_absolute
+
+def replace_image_links(content, path_to_url_map):
+    """Replaces local image paths in content with their remote URLs."""
+    return rewrite_markdown(content, path_to_url_map)[0]
+
+@traced("preprocess_markdown_content")
+def preprocess_markdown_content(content, base_dir):
+    """Finds local images, uploads them via PicGo, and replaces links."""
+    original_to_absolute = find_local_images(content, base_dir)
+
+    if not original_to_absolute:
+        return content
+
+    absolute_paths = builtins.list(dict.fromkeys(original_to_absolute.values()))
+    click.echo(f"Found {len(absolute_paths)} local images.")
+    absolute_to_url = upload_images(absolute_paths)
+
+    if not absolute_to_url:
+        click.echo("Image upload failed or returned incomplete results. Aborting.", err=True)
+        sys.exit(1)
+
+    # Create a map of original local path -> remote URL
+    path_to_url_map = {original: absolute_to_url[abs_path] for original, abs_path in original_to_absolute.items()}
+
+    updated_content = replace_image_links(content, path_to_url_map)
+    click.echo("Successfully replaced local image paths with remote URLs.")
+    return updated_content
+
+@traced("process_strikethrough_content")
+def process_strikethrough_content(title_hash, content, confirm=True):
+    """
+    Finds all strikethrough content, asks the user if they want to separate it,
+    and replaces it with a placeholder. With confirm=False the content is
+    separated without asking (used by batch publishing).
+    """
+    tokens = tokenize_markdown(content)
+    count = sum(1 for token in tokens if token[0] == "strike")
+    
+    if not count:
+        return content, None
+
+    if confirm:
+        click.echo(f"Found {count} sections with strikethrough text.")
+        if not click.confirm("Do you want to separate this content into the secret repository?", default=True):
+            return content, None
+
+    clean_content, secret_content = render_markdown_tokens(tokens, title_hash=title_hash)
+
+    if confirm:
+        click.echo("Separated secret content and replaced with placeholders.")
+    return clean_content, secret_content
+
+# --- Secret Store ---
+# Each post's secrets live in <title_hash>.json in the secret repo as a map of
+# content_hash -> individually encrypted span. All posts share one AES session
+# key per RSA public key; it is wrapped with RSA once and reused, so updating a
+# post only adds or drops the spans that changed. manifest.json bundles every
+# post so a reader can unlock the whole site with one fetch and one RSA decrypt.
+
+SECRET_STORE_VERSION = 2
+SECRET_MANIFEST_NAME = "manifest.json"
+SECRET_STORE_LOCK = threading.Lock()
+SESSION_KEY_CACHE = {} # (keys path, public key fingerprint) -> (key_id, session_key, wrapped key)
+PUBLIC_KEY_FINGERPRINTS = {} # id(public key) -> (public key, fingerprint)
+# Spans longer than this (e.g. pasted logs) are streamed into their own file in
+# blobs/<title_hash>/ as AES-GCM chunks, so neither side holds the whole
+# ciphertext in memory and the browser can render them as chunks arrive.
+SECRET_CHUNK_THRESHOLD = 64 * 1024
+SECRET_CHUNK_SIZE = 64 * 1024
+SECRET_GCM_TAG_SIZE = 16
+SECRET_BLOB_DIR = "blobs"
+
+def get_secret_keys_path():
+    """Returns the path to the locally kept AES session keys."""
+    home_dir = os.path.expanduser("~")
+    return os.path.join(home_dir, ".blog_uploader", "secret_keys.json")
+
+def get_public_key_fingerprint(public_key):
+    """Returns the SHA-256 of the key's DER form, computed once per key object."""
+    cached = PUBLIC_KEY_FINGERPRINTS.get(id(public_key))
+    if cached is None or cached[0] is not public_key:
+        # The key is kept alongside so its id cannot be reused by another object.
+        cached = (public_key, hashlib.sha256(public_key.export_key(format='DER')).hexdigest())
+        PUBLIC_KEY_FINGERPRINTS[id(public_key)] = cached
+    return cached[1]
+
+def get_site_session_key(public_key):
+    """
+    Returns (key_id, session_key, encrypted_session_key) for the current public
+    key, generating and wrapping a new session key the first time it is used.
+    The result is memoized for the process, and secret_keys.json is only read
+    and written under its file lock, so parallel runs agree on one key.
+    """
+    from Crypto.Cipher import PKCS1_v1_5
+    from Crypto.Random import get_random_bytes
+
+    keys_path = get_secret_keys_path()
+    with SECRET_STORE_LOCK:
+        fingerprint = get_public_key_fingerprint(public_key)
+        cached = SESSION_KEY_CACHE.get((keys_path, fingerprint))
+        if cached:
+            return cached
+
+        with file_lock(keys_path):
+            keys = {}
+            if os.path.exists(keys_path):
+                with open(keys_path, 'r', encoding='utf-8') as f:
+                    keys = json.load(f)
+
+            for key_id, entry in keys.items():
+                if entry.get("public_key") == fingerprint:
+                    result = key_id, base64.b64decode(entry["session_key"]), entry["encrypted_session_key"]
+                    break
+            else:
+                session_key = get_random_bytes(16) # 128-bit key
+                # The browser decrypts the wrapped key with JSEncrypt, which expects the base64 form.
+                cipher_rsa = PKCS1_v1_5.new(public_key)
+                encrypted_session_key = base64.b64encode(cipher_rsa.encrypt(base64.b64encode(session_key))).decode('utf-8')
+                key_id = hashlib.sha256(session_key).hexdigest()[:16]
+                keys[key_id] = {
+                    "public_key": fingerprint,
+                    "session_key": base64.b64encode(session_key).decode('utf-8'),
+                    "encrypted_session_key": encrypted_session_key,
+                }
+                write_json_atomic(keys_path, keys)
+                result = key_id, session_key, encrypted_session_key
+
+        SESSION_KEY_CACHE[(keys_path, fingerprint)] = result
+        return result
+
+def encrypt_secret_span(session_key, markdown):
+    """Encrypts one secret span with AES-CBC under the shared session key and a fresh IV."""
+    from Crypto.Cipher import AES
+    from Crypto.Util.Padding import pad
+
+    cipher_aes = AES.new(session_key, AES.MODE_CBC)
+    # Pad the data to be a multiple of the block size using PKCS7
+    ciphertext = cipher_aes.encrypt(pad(markdown.encode('utf-8'), AES.block_size))
+    return {
+        'iv': base64.b64encode(cipher_aes.iv).decode('utf-8'),
+        'ciphertext': base64.b64encode(ciphertext).decode('utf-8'),
+    }
+
+def get_secret_blob_path(secret_repo_dir, title_hash, content_hash):
+    """Returns the path of a chunked span's blob, relative to the secret repo if secret_repo_dir is None."""
+    relative_path = f"{SECRET_BLOB_DIR}/{title_hash}/{content_hash}.bin"
+    return relative_path if secret_repo_dir is None else os.path.join(secret_repo_dir, *relative_path.split("/"))
+
+def secret_chunk_aad(content_hash, index, final):
+    """Binds a chunk to its span, position and whether it is the last one, so chunks cannot be swapped or dropped."""
+    return content_hash.encode('ascii') + index.to_bytes(4, 'big') + (b'\x01' if final else b'\x00')
+
+def iter_utf8_chunks(text, size):
+    """
+    Yields (chunk, is_last) for text encoded as UTF-8 in chunks of exactly size
+    bytes (the last one may be shorter), encoding only a slice at a time.
+    """
+    buffer = bytearray()
+    pending = None
+    for start in range(0, len(text), size):
+        buffer += text[start:start + size].encode('utf-8')
+        while len(buffer) >= size:
+            if pending is not None:
+                yield pending, False
+            pending = bytes(buffer[:size])
+            del buffer[:size]
+    if buffer or pending is None:
+        if pending is not None:
+            yield pending, False
+        pending = bytes(buffer)
+    yield pending, True
+
+@traced("encrypt_secret_chunks")
+def encrypt_secret_chunks(session_key, markdown, secret_repo_dir, title_hash, content_hash):
+    """
+    Streams a large span through AES-GCM into its blob file and returns the span
+    entry with the chunk index. Chunk i covers plaintext bytes
+    [i * chunk_size, (i + 1) * chunk_size) and is stored as its ciphertext
+    followed by the tag, under the nonce prefix plus i as a 4-byte counter.
+    """
+    from Crypto.Cipher import AES
+    from Crypto.Random import get_random_bytes
+
+    nonce_prefix = get_random_bytes(8)
+    blob_path = get_secret_blob_path(secret_repo_dir, title_hash, content_hash)
+    os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+    tmp_path = blob_path + ".tmp"
+    size = 0
+    chunk_count = 0
+    with open(tmp_path, 'wb') as f:
+        for chunk, is_last in iter_utf8_chunks(markdown, SECRET_CHUNK_SIZE):
+            cipher = AES.new(session_key, AES.MODE_GCM, nonce=nonce_prefix + chunk_count.to_bytes(4, 'big'))
+            cipher.update(secret_chunk_aad(content_hash, chunk_count, is_last))
+            ciphertext, tag = cipher.encrypt_and_digest(chunk)
+            f.write(ciphertext)
+            f.write(tag)
+            size += len(chunk)
+            chunk_count += 1
+    os.replace(tmp_path, blob_path)
+    plan_path(blob_path)
+    return {
+        "chunked": {
+            "file": get_secret_blob_path(None, title_hash, content_hash),
+            "nonce": base64.b64encode(nonce_prefix).decode('utf-8'),
+            "chunk_size": SECRET_CHUNK_SIZE,
+            "chunks": chunk_count,
+            "size": size,
+        },
+    }
+
+def encrypt_secret_content(secret_repo_dir, title_hash, session_key, secret_content, existing_spans):
+    """
+    Encrypts each span of a post, reusing the stored entry of spans that did not
+    change. Large spans are streamed into chunked blobs; the others are stored inline.
+    """
+    spans = {}
+    for content_hash, markdown in secret_content.items():
+        existing = existing_spans.get(content_hash)
+        if existing and ("chunked" not in existing or os.path.exists(
+                get_secret_blob_path(secret_repo_dir, title_hash, content_hash))):
+            spans[content_hash] = existing
+        elif len(markdown) > SECRET_CHUNK_THRESHOLD:
+            spans[content_hash] = encrypt_secret_chunks(session_key, markdown, secret_repo_dir, title_hash, content_hash)
+        else:
+            spans[content_hash] = encrypt_secret_span(session_key, markdown)
+    return spans
+
+def remove_stale_secret_blobs(secret_repo_dir, title_hash, spans):
+    """Deletes the blobs of a post's chunked spans that are no longer in spans."""
+    blob_dir = os.path.join(secret_repo_dir, SECRET_BLOB_DIR, title_hash)
+    if not os.path.isdir(blob_dir):
+        return
+    for filename in os.listdir(blob_dir):
+        if os.path.splitext(filename)[0] not in spans:
+            remove_path(os.path.join(blob_dir, filename))
+    if not os.listdir(blob_dir):
+        os.rmdir(blob_dir)
+
+def remove_secret_post(secret_repo_dir, title_hash):
+    """Drops all secrets of a post: its secret file, its blobs and its manifest entry."""
+    remove_path(os.path.join(secret_repo_dir, f"{title_hash}.json"))
+    remove_stale_secret_blobs(secret_repo_dir, title_hash, {})
+    update_secret_manifest(secret_repo_dir, title_hash, None)
+
+def load_secret_file(secret_filepath):
+    """Loads a post's secret file, or returns None if it is missing or in the old format."""
+    if not os.path.exists(secret_filepath):
+        return None
+    try:
+        with open(secret_filepath, 'r', encoding='utf-8') as f:
+            payload = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if payload.get("version") != SECRET_STORE_VERSION:
+        return None
+    return payload
+
+def update_secret_manifest(secret_repo_dir, title_hash, payload):
+    """Replaces (or, with payload=None, drops) one post in the bundled manifest."""
+    manifest_path = os.path.join(secret_repo_dir, SECRET_MANIFEST_NAME)
+    with SECRET_STORE_LOCK:
+        manifest = load_secret_file(manifest_path) or {"version": SECRET_STORE_VERSION, "keys": {}, "posts": {}}
+        if payload is None:
+            manifest["posts"].pop(title_hash, None)
+        else:
+            manifest["keys"][payload["key_id"]] = payload["encrypted_session_key"]
+            manifest["posts"][title_hash] = {"key_id": payload["key_id"], "spans": payload["spans"]}
+        used_keys = {post["key_id"] for post in manifest["posts"].values()}
+        manifest["keys"] = {key_id: wrapped for key_id, wrapped in manifest["keys"].items() if key_id in used_keys}
+        write_file_if_changed(manifest_path, json.dumps(manifest, indent=1, sort_keys=True))
+
+@traced("encryption")
+def write_secret_file(secret_repo_dir, title_hash, secret_content, public_key):
+    """
+    Encrypts the secret content of a post and writes it to the secret repo.
+    Spans that are already stored under the same key are kept as they are, so
+    only added or changed spans are encrypted and show up in the diff.
+    """
+    key_id, session_key, encrypted_session_key = get_site_session_key(public_key)
+    
+    secret_filename = f"{title_hash}.json"
+    secret_filepath = os.path.join(secret_repo_dir, secret_filename)
+
+    existing = load_secret_file(secret_filepath)
+    existing_spans = existing["spans"] if existing and existing.get("key_id") == key_id else {}
+    spans = encrypt_secret_content(secret_repo_dir, title_hash, session_key, secret_content, existing_spans)
+    remove_stale_secret_blobs(secret_repo_dir, title_hash, spans)
+
+    payload = {
+        "version": SECRET_STORE_VERSION,
+        "key_id": key_id,
+        "encrypted_session_key": encrypted_session_key,
+        "spans": spans,
+    }
+    # One span per line keeps the git diff down to the spans that changed.
+    write_file_if_changed(secret_filepath, json.dumps(payload, indent=1, sort_keys=True))
+    update_secret_manifest(secret_repo_dir, title_hash, payload)
+    return secret_filepath
+
+# --- Post Index ---
+
+CONTENT_TYPES = ['post', 'thought']
+POST_INDEX_VERSION = 1
+
+def get_post_index_path():
+    """Returns the path to the on-disk post metadata index."""
+    home_dir = os.path.expanduser("~")
+    return os.path.join(home_dir, ".blog_uploader", "post_index.json")
+
+def load_post_index():
+    """Loads the post index, returning an empty one if it is missing or outdated."""
+    index_path = get_post_index_path()
+    if os.path.exists(index_path):
+        try:
+            with open(index_path, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+            if index.get("version") == POST_INDEX_VERSION:
+                return index
+        except (OSError, ValueError):
+            pass
+    return {"version": POST_INDEX_VERSION, "entries": {}}
+
+def save_post_index(index):
+    """Writes the post index atomically so an interrupted run never leaves it half-written."""
+    write_json_atomic(get_post_index_path(), index)
+
+def parse_post_metadata(index_path):
+    """Parses a single index.md into the flat record stored in the post index."""
+    import frontmatter
+
+    with open(index_path, 'r', encoding='utf-8') as f:
+        post = frontmatter.load(f)
+
+    date_obj = post.metadata.get('date')
+    date_str = 'N/A'
+    if isinstance(date_obj, (datetime.date, datetime.datetime)):
+        date_str = date_obj.strftime('%Y-%m-%d')
+    elif date_obj:
+        date_str = str(date_obj)
+
+    categories = post.metadata.get('categories')
+    if isinstance(categories, builtins.list):
+        categories = [str(tag) for tag in categories]
+    elif categories:
+        categories = [str(categories)]
+    else:
+        categories = []
+
+    return {
+        "title": str(post.metadata.get('title', 'N/A')),
+        "date": date_str,
+        "categories": categories,
+        "word_count": len(post.content),
+    }
+
+@traced("update_post_index")
+def update_post_index(temp_dir):
+    """
+    Brings the post index in line with the checkout in temp_dir.
+    Only index.md files whose mtime or size changed are re-parsed, and entries
+    for directories that no longer exist are pruned.
+    """
+    index = load_post_index()
+    entries = index["entries"]
+    seen = set()
+    changed = False
+
+    for c_type in CONTENT_TYPES:
+        content_dir = os.path.join(temp_dir, "content", c_type)
+        if not os.path.isdir(content_dir):
+            continue
+
+        with os.scandir(content_dir) as it:
+            for item in it:
+                if not item.is_dir():
+                    continue
+                index_path = os.path.join(item.path, "index.md")
+                try:
+                    stat = os.stat(index_path)
+                except OSError:
+                    continue
+
+                key = f"{c_type}/{item.name}"
+                seen.add(key)
+                entry = entries.get(key)
+                if entry and entry["mtime"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+                    continue
+
+                entry = {"type": c_type, "name": item.name, "mtime": stat.st_mtime_ns, "size": stat.st_size}
+                try:
+                    entry.update(parse_post_metadata(index_path))
+                except Exception as e:
+                    entry["error"] = str(e)
+                entries[key] = entry
+                changed = True
+
+    for key in builtins.list(entries):
+        if key not in seen:
+            del entries[key]
+            changed = True
+
+    if changed:
+        save_post_index(index)
+    return entries
+
+def parse_list_filters(filters):
+    """Parses repeated --filter KEY=VALUE options into a dict."""
+    parsed = {}
+    for item in filters:
+        key, sep, value = item.partition("=")
+        key = key.strip().lower()
+        if not sep or key not in ("type", "category", "date"):
+            raise click.BadParameter(f"Invalid filter '{item}'. Use type=..., category=... or date=....", param_hint="--filter")
+        parsed[key] = value.strip()
+    return parsed
+
+def entry_matches_filters(entry, filters):
+    """Checks whether an index entry satisfies the parsed filters."""
+    if "type" in filters and entry["type"] != filters["type"]:
+        return False
+    if "category" in filters and filters["category"] not in entry.get("categories", []):
+        return False
+    if "date" in filters:
+        # A date filter is a prefix (2025, 2025-03, 2025-03-09) or a range (2025-01..2025-06).
+        date_str = entry.get("date", "N/A")
+        if date_str == "N/A":
+            return False
+        start, sep, end = filters["date"].partition("..")
+        if sep:
+            if start and date_str[:len(start)] < start:
+                return False
+            if end and date_str[:len(end)] > end:
+                return False
+        elif not date_str.startswith(start):
+            return False
+    return True
+
+# --- Search Index ---
+# The site's search page reads a prebuilt inverted index from static/search/
+# instead of downloading every post and fuzzy-scanning it. Terms are sharded by
+# their first character (CJK characters in blocks of SEARCH_SHARD_SPAN code
+# points), so a query only fetches the shards of its own terms. CJK text has no
+# word boundaries and is indexed as overlapping bigrams. The tokenizer must stay
+# in sync with assets/js/shardsearch.js.
+
+SEARCH_INDEX_VERSION = 3 # 2: URLs follow Hugo path sanitizing, 3: bookkeeping moved out of docs.json
+SEARCH_INDEX_DIR = os.path.join("static", "search")
+# Content hashes, ids and shard lists of the indexed posts. They are only needed
+# for incremental updates, so they live outside static/ and are never served.
+SEARCH_STATE_PATH = "search_index.json"
+SEARCH_SHARD_SPAN = 256
+SEARCH_TITLE_WEIGHT = 10
+SEARCH_MAX_TERM_FREQUENCY = 20
+SEARCH_SUMMARY_LENGTH = 120
+SEARCH_WORD_PATTERN = re.compile(r"[^\W_]+")
+SEARCH_CJK_PATTERN = re.compile(r"([\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uac00-\ud7af]+)")
+HUGO_PATH_CHARACTERS = set("./\\_#+~-@")
+HEX_PAIR_PATTERN = re.compile(r"[0-9a-fA-F]{2}")
+SEARCH_MARKUP_PATTERNS = [
+    (re.compile(r"<[^>]+>"), " "), # HTML, including secret placeholders
+    (re.compile(r"!?\[([^\]]*)\]\([^)]*\)"), r"\1"), # links and images keep their text
+    (re.compile(r"https?://\S+"), " "),
+]
+
+def tokenize_search_text(text):
+    """Splits text into index terms: lowercase words, and bigrams for CJK runs."""
+    import unicodedata
+
+    terms = []
+    for word in SEARCH_WORD_PATTERN.findall(unicodedata.normalize("NFKC", text).lower()):
+        for i, part in enumerate(SEARCH_CJK_PATTERN.split(word)):
+            if i % 2 == 0:
+                # Single letters are too common to be worth indexing.
+                if len(part) > 1:
+                    terms.append(part)
+            elif len(part) == 1:
+                terms.append(part)
+            else:
+                terms.extend(part[j:j + 2] for j in range(len(part) - 1))
+    return terms
+
+def search_shard_for(term):
+    """Returns the shard a term is stored in."""
+    if term[0].isascii():
+        return term[0]
+    return f"u{ord(term[0]) // SEARCH_SHARD_SPAN:x}"
+
+def hugo_path(text):
+    """
+    Sanitizes a URL path the way Hugo does: letters, digits, marks and ./_#+~-@
+    are kept, runs of spaces become one hyphen, everything else is dropped, and
+    the result is lowercased.
+    """
+    import unicodedata
+
+    result = []
+    hyphen = False
+    for i, char in enumerate(text):
+        allowed = (
+            char in HUGO_PATH_CHARACTERS
+            or unicodedata.category(char)[0] in "LM"
+            or unicodedata.category(char) == "Nd"
+            or (char == "%" and HEX_PAIR_PATTERN.fullmatch(text[i + 1:i + 3]) is not None)
+        )
+        if allowed:
+            if hyphen:
+                result.append("-")
+                hyphen = False
+            result.append(char)
+        elif result and char.isspace():
+            hyphen = True
+    return "".join(result).lower()
+
+def hugo_page_url(metadata, content_type, dir_name):
+    """Returns the URL Hugo publishes a page bundle at, honouring its url and slug frontmatter."""
+    url = str(metadata.get("url") or "").strip()
+    if url:
+        url = "/" + url.lstrip("/")
+        # A url without a file extension is a directory, which Hugo serves with a trailing slash.
+        return url if url.endswith("/") or os.path.splitext(url)[1] else url + "/"
+    slug = str(metadata.get("slug") or "").strip() or dir_name
+    return f"/{hugo_path(content_type)}/{hugo_path(slug)}/"
+
+def extract_search_document(index_md_path, content_type):
+    """Reads a post into its search document, or None if it should not be searchable."""
+    import frontmatter
+
+    with open(index_md_path, "r", encoding='utf-8') as f:
+        post = frontmatter.load(f)
+    metadata = post.metadata
+    if metadata.get("draft") or metadata.get("searchHidden"):
+        return None
+
+    text = post.content
+    for pattern, replacement in SEARCH_MARKUP_PATTERNS:
+        text = pattern.sub(replacement, text)
+    plain = " ".join(re.sub(r"[#*>`|~_-]+", " ", text).split())
+    title = str(metadata.get("title", ""))
+    summary = str(metadata.get("summary") or metadata.get("description") or "").strip()
+    date = metadata.get("date")
+
+    weights = {}
+    for term in tokenize_search_text(plain):
+        weights[term] = weights.get(term, 0) + 1
+    weights = {term: min(count, SEARCH_MAX_TERM_FREQUENCY) for term, count in weights.items()}
+    for term in tokenize_search_text(title):
+        weights[term] = weights.get(term, 0) + SEARCH_TITLE_WEIGHT
+
+    return {
+        "title": title,
+        "url": hugo_page_url(metadata, content_type, os.path.basename(os.path.dirname(index_md_path))),
+        "summary": summary or plain[:SEARCH_SUMMARY_LENGTH],
+        "date": date.strftime('%Y-%m-%d') if isinstance(date, (datetime.date, datetime.datetime)) else str(date or ""),
+        "weights": weights,
+    }
+
+def load_search_json(path, default):
+    """Loads one search index file, or returns default if it is missing or broken."""
+    if os.path.exists(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            pass
+    return default
+
+def write_search_json(path, data):
+    """Writes a search index file compactly, with sorted keys for stable diffs."""
+    write_file_if_changed(path, json.dumps(data, ensure_ascii=False, separators=(',', ':'), sort_keys=True))
+
+@traced("update_search_index")
+def update_search_index(site_dir):
+    """
+    Brings static/search/ in line with the posts in site_dir. Posts are compared
+    by content hash with the document table in SEARCH_STATE_PATH, and only the
+    shards holding terms of added, changed or removed posts are rewritten.
+    static/search/docs.json gets just what results display.
+    """
+    index_dir = os.path.join(site_dir, SEARCH_INDEX_DIR)
+    shard_dir = os.path.join(index_dir, "shards")
+    docs_path = os.path.join(index_dir, "docs.json")
+    state_path = os.path.join(site_dir, SEARCH_STATE_PATH)
+    table = load_search_json(state_path, None)
+    public_docs = load_search_json(docs_path, {}).get("docs", {})
+    if (not table or table.get("version") != SEARCH_INDEX_VERSION
+            or any(doc["shards"] and doc_id not in public_docs for doc_id, doc in table["docs"].items())):
+        # Unknown, missing or inconsistent index: start over so no stale shard survives.
+        remove_path(index_dir)
+        table = {"version": SEARCH_INDEX_VERSION, "next_id": 0, "docs": {}}
+        public_docs = {}
+    docs = table["docs"]
+    ids_by_key = {doc["key"]: doc_id for doc_id, doc in docs.items()}
+
+    current = {}
+    for content_type in CONTENT_TYPES:
+        for index_md_path in glob.glob(os.path.join(site_dir, "content", content_type, "*", "index.md")):
+            key = os.path.relpath(os.path.dirname(index_md_path), site_dir).replace(os.sep, "/")
+            current[key] = (index_md_path, content_type, hash_file(index_md_path))
+
+    removed = {}  # doc_id -> shards its old postings live in
+    added = {}    # doc_id -> new search document
+    stubs_changed = False
+    for key, doc_id in ids_by_key.items():
+        if key not in current or current[key][2] != docs[doc_id]["hash"]:
+            removed[doc_id] = docs[doc_id]["shards"]
+    for key, (index_md_path, content_type, digest) in current.items():
+        doc_id = ids_by_key.get(key)
+        if doc_id is not None and doc_id not in removed:
+            continue
+        document = extract_search_document(index_md_path, content_type)
+        if doc_id is None:
+            doc_id = str(table["next_id"])
+            table["next_id"] += 1
+        if document is None:
+            # Keep a stub so the unchanged draft is not parsed again next time.
+            docs[doc_id] = {"key": key, "hash": digest, "shards": []}
+            public_docs.pop(doc_id, None)
+            stubs_changed = True
+            continue
+        added[doc_id] = (key, digest, document)
+    if not removed and not added and not stubs_changed:
+        return
+
+    touched = {shard: {} for shards in removed.values() for shard in shards}
+    for doc_id in removed:
+        if docs[doc_id]["key"] not in current:
+            del docs[doc_id]
+            public_docs.pop(doc_id, None)
+    for doc_id, (key, digest, document) in added.items():
+        shards = set()
+        for term, weight in document.pop("weights").items():
+            shard = search_shard_for(term)
+            shards.add(shard)
+            # Postings are flat [doc, weight, doc, weight, ...] lists.
+            touched.setdefault(shard, {}).setdefault(term, []).extend((int(doc_id), weight))
+        docs[doc_id] = {"key": key, "hash": digest, "shards": sorted(shards)}
+        public_docs[doc_id] = document
+
+    os.makedirs(shard_dir, exist_ok=True)
+    stale = {int(doc_id) for doc_id in removed}
+    for shard, new_postings in touched.items():
+        shard_path = os.path.join(shard_dir, f"{shard}.json")
+        postings = load_search_json(shard_path, {})
+        for term in builtins.list(postings):
+            pairs = postings[term]
+            kept = [value for i in range(0, len(pairs), 2) if pairs[i] not in stale for value in pairs[i:i + 2]]
+            if kept:
+                postings[term] = kept
+            else:
+                del postings[term]
+        for term, pairs in new_postings.items():
+            postings.setdefault(term, []).extend(pairs)
+        if postings:
+            write_search_json(shard_path, postings)
+        else:
+            remove_path(shard_path)
+    write_search_json(docs_path, {"docs": public_docs})
+    write_search_json(state_path, table)
+    click.echo(f"Search index updated: {len(added)} posts indexed, {len(touched)} shards rewritten.")
+
+# --- Hugo Build ---
+
+HUGO_STATS_PATTERN = re.compile(r'^\s*([A-Za-z][A-Za-z ]*?)\s*\|\s*([\d\s|]+)$')
+HUGO_TOTAL_PATTERN = re.compile(r'Total in (\d+) ms')
+BUILD_HISTORY_LIMIT = 50
+
+def get_build_stats_path():
+    """Returns the path to the file recording past build timings."""
+    home_dir = os.path.expanduser("~")
+    return os.path.join(home_dir, ".blog_uploader", "build_stats.json")
+
+@traced("hugo")
+def run_hugo(args, site_dir):
+    """Runs hugo with the given arguments inside site_dir, exiting on failure."""
+    try:
+        result = subprocess.run(["hugo"] + args, cwd=site_dir, capture_output=True, text=True)
+    except OSError as e:
+        click.echo(f"Failed to run hugo: {e}", err=True)
+        sys.exit(1)
+    if result.returncode != 0:
+        click.echo(result.stdout, err=True)
+        click.echo(result.stderr, err=True)
+        click.echo(f"Error: 'hugo {' '.join(args)}' exited with status {result.returncode}.", err=True)
+        sys.exit(1)
+    return result
+
+def parse_hugo_stats(output):
+    """Extracts the page/file counts and total time from hugo's build summary."""
+    stats = {}
+    for line in output.splitlines():
+        match = HUGO_STATS_PATTERN.match(line)
+        if match:
+            # One column per language; sum them so multilingual sites report totals.
+            counts = [int(n) for n in re.findall(r'\d+', match.group(2))]
+            stats[match.group(1).strip().lower().replace(" ", "_")] = sum(counts)
+    total = HUGO_TOTAL_PATTERN.search(output)
+    if total:
+        stats["hugo_ms"] = int(total.group(1))
+    return stats
+
+def record_build_stats(stats):
+    """Appends a build to the build history, keeping only the most recent ones."""
+    stats_path = get_build_stats_path()
+    history = []
+    if os.path.exists(stats_path):
+        try:
+            with open(stats_path, 'r', encoding='utf-8') as f:
+                history = json.load(f)
+        except (OSError, ValueError):
+            history = []
+    history.append(stats)
+    write_json_atomic(stats_path, history[-BUILD_HISTORY_LIMIT:])
+
+def resolve_skip_build(skip_build):
+    """Applies the skip_local_build config default to a --skip-build/--build flag."""
+    if skip_build is None:
+        return load_config().get("skip_local_build", False)
+    return skip_build
+
+@traced("hugo build")
+def build_site(site_dir, skip_build=None):
+    """
+    Refreshes the search index and the cache headers, and builds the site with
+    hugo, reporting how long it took. The build is skipped if skip_build (or the skip_local_build
+    config key) is set, since Netlify runs its own build from netlify.toml on
+    every push.
+    """
+    # The search index is committed under static/, so it is needed even when hugo does not run here.
+    update_search_index(site_dir)
+    write_cache_headers(site_dir, CACHE_HEADER_RULES)
+    config = load_config()
+    if resolve_skip_build(skip_build):
+        click.echo("Skipping local hugo build; the deployment will build the site.")
+        return None
+
+    click.echo("Running hugo build...")
+    # A persistent cache dir lets processed images and fetched resources be reused between runs.
+    cache_dir = os.path.join(os.path.expanduser("~"), ".blog_uploader", "hugo_cache")
+    args = ["--cacheDir", cache_dir]
+    template_metrics = config.get("hugo_template_metrics", False)
+    if template_metrics:
+        args += ["--templateMetrics", "--templateMetricsHints"]
+
+    start = time.perf_counter()
+    result = run_hugo(args, site_dir)
+    elapsed = time.perf_counter() - start
+
+    stats = parse_hugo_stats(result.stdout)
+    stats["seconds"] = round(elapsed, 3)
+    stats["timestamp"] = time.time()
+    record_build_stats(stats)
+
+    if template_metrics:
+        click.echo(result.stdout)
+    click.echo(f"Built {stats.get('pages', '?')} pages in {elapsed:.2f}s.")
+
+    if config.get("precompress", False):
+        precompress_site(os.path.join(site_dir, "public"))
+    return stats
+
+# --- Precompression ---
+# With "precompress" set, text files in public/ get .gz (and, with the Brotli
+# package, .br) siblings after a local build, for self-hosted sites served by
+# nginx's gzip_static/brotli_static or Caddy's precompressed. Compressed files
+# are kept in ~/.blog_uploader/precompressed by the SHA-256 of their source, so
+# unchanged files are copied instead of compressed again. Netlify builds and
+# compresses the site itself; for it, only the cache headers in netlify.toml count.
+
+PRECOMPRESS_EXTENSIONS = {'.html', '.css', '.js', '.json', '.xml', '.svg'}
+PRECOMPRESS_MIN_SIZE = 1024
+PRECOMPRESS_ENCODINGS = ("gz", "br")
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "public, max-age=0, must-revalidate"
+# Hugo only writes fingerprinted bundles (stylesheet.<hash>.css, search.<hash>.js,
+# shardsearch.<hash>.js, ...) to these directories, and static/ adds nothing to them.
+CACHE_HEADER_RULES = [
+    ("/assets/css/*", IMMUTABLE_CACHE_CONTROL),
+    ("/assets/js/*", IMMUTABLE_CACHE_CONTROL),
+    ("/js/*", IMMUTABLE_CACHE_CONTROL),
+    ("/" + os.path.relpath(SEARCH_INDEX_DIR, "static").replace(os.sep, "/") + "/*", REVALIDATE_CACHE_CONTROL),
+]
+CACHE_HEADERS_BEGIN = "# --- Cache headers (generated by blog-uploader, do not edit) ---"
+CACHE_HEADERS_END = "# --- End of generated cache headers ---"
+
+def get_precompressed_dir():
+    """Returns the directory holding compressed copies of built files."""
+    home_dir = os.path.expanduser("~")
+    return os.path.join(home_dir, ".blog_uploader", "precompressed")
+
+def get_precompress_encodings():
+    """Returns the encodings to write: gzip always, Brotli if its package is installed."""
+    try:
+        import brotli
+    except ImportError:
+        return ["gz"]
+    return ["gz", "br"]
+
+def compress_file(source_path, cache_path, encoding):
+    """Compresses a file into cache_path at the highest level and returns its size. Runs in a worker process."""
+    with open(source_path, 'rb') as f:
+        data = f.read()
+    if encoding == "br":
+        import brotli
+        compressed = brotli.compress(data, quality=11)
+    else:
+        import gzip
+        compressed = gzip.compress(data, compresslevel=9, mtime=0)
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(compressed)
+    os.replace(tmp_path, cache_path)
+    return len(compressed)
+
+def iter_public_files(public_dir):
+    """Yields the paths of the built files below public_dir, relative to it and with forward slashes."""
+    for root, _, files in os.walk(public_dir):
+        for name in files:
+            yield os.path.relpath(os.path.join(root, name), public_dir).replace(os.sep, "/")
+
+@traced("precompress_site")
+def precompress_site(public_dir):
+    """Writes .gz/.br siblings of the text files in public_dir, compressing only content not seen before."""
+    from concurrent.futures import ProcessPoolExecutor
+
+    if not os.path.isdir(public_dir):
+        return
+    encodings = get_precompress_encodings()
+    store = get_precompressed_dir()
+    copies = []
+    jobs = {}
+    for rel_path in builtins.list(iter_public_files(public_dir)):
+        path = os.path.join(public_dir, rel_path)
+        extension = os.path.splitext(rel_path)[1]
+        if extension[1:] in PRECOMPRESS_ENCODINGS:
+            # Drop siblings whose source is gone or no longer compressed.
+            source_path = path[:-len(extension)]
+            if os.path.splitext(source_path)[1].lower() in PRECOMPRESS_EXTENSIONS and (
+                not os.path.exists(source_path) or os.path.getsize(source_path) < PRECOMPRESS_MIN_SIZE
+            ):
+                os.remove(path)
+            continue
+        if extension.lower() not in PRECOMPRESS_EXTENSIONS or os.path.getsize(path) < PRECOMPRESS_MIN_SIZE:
+            continue
+        digest = hash_file(path)
+        for encoding in encodings:
+            cache_path = os.path.join(store, digest[:2], f"{digest}.{encoding}")
+            copies.append((cache_path, f"{path}.{encoding}"))
+            if not os.path.exists(cache_path):
+                jobs.setdefault(cache_path, (path, cache_path, encoding))
+
+    if jobs:
+        click.echo(f"Precompressing {len(jobs)} files ({', '.join(encodings)})...")
+        jobs = builtins.list(jobs.values())
+        with contextlib.ExitStack() as stack:
+            if len(jobs) == 1:
+                calls = [functools.partial(compress_file, *jobs[0])]
+            else:
+                executor = stack.enter_context(ProcessPoolExecutor())
+                calls = [executor.submit(compress_file, *job).result for job in jobs]
+            for (path, _, encoding), call in zip(jobs, calls):
+                try:
+                    call()
+                except Exception as e:
+                    click.echo(click.style(f"Warning: Could not compress {path} ({encoding}): {e}", fg="yellow"))
+
+    for cache_path, target in copies:
+        if os.path.exists(cache_path):
+            shutil.copyfile(cache_path, target)
+        elif os.path.exists(target):
+            os.remove(target)
+
+def write_cache_headers(site_dir, rules):
+    """Replaces the generated [[headers]] block at the end of netlify.toml with rules."""
+    toml_path = os.path.join(site_dir, "netlify.toml")
+    if not os.path.exists(toml_path):
+        return
+    with open(toml_path, 'r', encoding='utf-8') as f:
+        content = f.read()
+    start = content.find(CACHE_HEADERS_BEGIN)
+    if start != -1:
+        end = content.find(CACHE_HEADERS_END, start)
+        content = content[:start] + (content[end + len(CACHE_HEADERS_END):] if end != -1 else "")
+
+    lines = [CACHE_HEADERS_BEGIN]
+    for pattern, cache_control in rules:
+        lines += ["[[headers]]", f'  for = "{pattern}"', "  [headers.values]", f'    Cache-Control = "{cache_control}"']
+    lines.append(CACHE_HEADERS_END)
+    write_file_if_changed(toml_path, content.rstrip("\n") + "\n\n" + "\n".join(lines) + "\n")
+
+# --- Batch Publishing ---
+
+def resolve_source_files(source):
+    """Expands a directory or glob pattern into a sorted list of markdown files."""
+    if os.path.isdir(source):
+        pattern = os.path.join(source, "**", "*.md")
+    else:
+        pattern = source
+    return sorted(f for f in glob.glob(pattern, recursive=True) if os.path.isfile(f))
+
+def default_post_metadata(content_type, title):
+    """Returns the frontmatter the archetype for content_type would generate."""
+    now = datetime.datetime.now().astimezone().replace(microsecond=0).isoformat()
+    if content_type == 'thought':
+        return {"title": title, "date": now, "draft": False, "categories": ["想法"]}
+    return {
+        "title": title,
+        "description": "",
+        "date": now,
+        "lastmod": now,
+        "categories": ["未分类"],
+        "mermaid": True,
+        "draft": False,
+    }
+
+def load_batch_source(filepath):
+    """Reads one source file and collects what the batch needs to know about it."""
+    import frontmatter
+    from slugify import slugify
+
+    with open(filepath, "r", encoding='utf-8') as f:
+        source = frontmatter.loads(f.read())
+    title = str(source.metadata.get("title") or os.path.splitext(os.path.basename(filepath))[0])
+    base_dir = os.path.dirname(os.path.abspath(filepath))
+    return {
+        "path": filepath,
+        "source": source,
+        "title": title,
+        "slug": slugify(title),
+        "images": find_local_images(source.content, base_dir),
+        "has_secrets": "~~" in source.content,
+    }
+
+def write_batch_post(plan, content_dir, content_type, url_map, secret_repo_dir, public_key):
+    """Rewrites one source file (images and secrets) and writes it as a post directory."""
+    import frontmatter
+
+    source = plan["source"]
+    path_to_url_map = {original: url_map[abs_path] for original, abs_path in plan["images"].items()}
+    title_hash = hashlib.sha256(plan["title"].encode('utf-8')).hexdigest() if secret_repo_dir else None
+    # Images and secrets are rewritten together in a single pass over the body.
+    content, secret_content = rewrite_markdown(source.content, path_to_url_map, title_hash)
+
+    secret_filepath = None
+    if secret_content:
+        secret_filepath = write_secret_file(secret_repo_dir, title_hash, secret_content, public_key)
+
+    metadata = default_post_metadata(content_type, plan["title"])
+    metadata.update(source.metadata)
+    post = frontmatter.Post(content, **metadata)
+
+    # An existing post is overwritten file by file, so unchanged files stay out of the commit.
+    sync_directory(os.path.join(content_dir, plan["slug"]), {"index.md": frontmatter.dumps(post, sort_keys=False) + "\n"})
+    return secret_filepath
+
+@traced("publish_batch")
+def publish_batch(source_files, content_type, jobs, skip_build=None):
+    """
+    Publishes many source files at once: images are uploaded together, every
+    file is rewritten on a worker pool, and the site is built and each repo
+    committed and pushed only once.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    jobs = max(1, jobs)
+    click.echo(f"Reading {len(source_files)} files...")
+    try:
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            plans = builtins.list(executor.map(inherit_trace(load_batch_source), source_files))
+    except Exception as e:
+        click.echo(f"Failed to read source files: {e}", err=True)
+        sys.exit(1)
+
+    secret_count = sum(1 for plan in plans if plan["has_secrets"])
+    if secret_count:
+        temp_dir, synced_secret_repo_dir = sync_all_repos()
+    else:
+        temp_dir = get_temp_dir()
+    content_dir = os.path.join(temp_dir, "content", content_type)
+
+    # Two sources with the same title would silently overwrite each other.
+    seen_slugs = {}
+    for plan in plans:
+        if plan["slug"] in seen_slugs:
+            click.echo(f"Error: '{plan['path']}' and '{seen_slugs[plan['slug']]}' both map to '{plan['slug']}'.", err=True)
+            sys.exit(1)
+        seen_slugs[plan["slug"]] = plan["path"]
+
+    existing = [plan["slug"] for plan in plans if os.path.exists(os.path.join(content_dir, plan["slug"]))]
+    if existing:
+        click.echo(f"{len(existing)} posts already exist: {', '.join(existing)}")
+        if not click.confirm("Overwrite them?"):
+            click.echo("Aborted.")
+            return
+
+    secret_repo_dir = None
+    public_key = None
+    if secret_count:
+        click.echo(f"Found strikethrough text in {secret_count} files.")
+        if click.confirm("Do you want to separate this content into the secret repository?", default=True):
+            secret_repo_dir = synced_secret_repo_dir
+            public_key = get_or_setup_public_key()
+
+    absolute_paths = builtins.list(dict.fromkeys(path for plan in plans for path in plan["images"].values()))
+    url_map = {}
+    if absolute_paths:
+        click.echo(f"Found {len(absolute_paths)} local images.")
+        url_map = upload_images(absolute_paths)
+        if not url_map:
+            click.echo("Image upload failed or returned incomplete results. Aborting.", err=True)
+            sys.exit(1)
+
+    click.echo(f"Writing {len(plans)} {content_type}s...")
+    os.makedirs(content_dir, exist_ok=True)
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        futures = [
+            executor.submit(inherit_trace(write_batch_post), plan, content_dir, content_type, url_map, secret_repo_dir, public_key)
+            for plan in plans
+        ]
+        secret_files = [future.result() for future in futures]
+    for plan in plans:
+        record_source(plan["path"], content_type, plan["slug"])
+
+    secret_files = [f for f in secret_files if f]
+    if secret_files:
+        click.echo(f"Secret content of {len(secret_files)} posts encrypted.")
+    else:
+        secret_repo_dir = None
+
+    build_site(temp_dir, skip_build)
+
+    publish_changes(
+        temp_dir, f"Add {len(plans)} new {content_type}s",
+        secret_repo_dir, f"Add secrets for {len(secret_files)} posts",
+    )
+
+# --- Watch Mode ---
+# ~/.blog_uploader/sources.json maps every source file that was published to
+# the post directory it became, so later edits update that post in place.
+
+WATCH_POLL_INTERVAL = 1.0 # seconds between scans when watchdog is not installed
+SOURCES_LOCK = threading.Lock()
+
+def get_sources_path():
+    """Returns the path to the source file -> post map."""
+    home_dir = os.path.expanduser("~")
+    return os.path.join(home_dir, ".blog_uploader", "sources.json")
+
+def load_sources():
+    """Loads the source file -> post map."""
+    sources_path = get_sources_path()
+    if os.path.exists(sources_path):
+        try:
+            with open(sources_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            pass
+    return {}
+
+def record_source(source_path, content_type, slug):
+    """Remembers that source_path was published as content/<content_type>/<slug>."""
+    with SOURCES_LOCK:
+        sources = load_sources()
+        sources[os.path.abspath(source_path)] = {"type": content_type, "slug": slug}
+        write_json_atomic(get_sources_path(), sources)
+
+def find_post_for_source(temp_dir, plan, content_type):
+    """Returns the post directory a source file was published to, or None if it is new."""
+    entry = load_sources().get(os.path.abspath(plan["path"]))
+    if entry:
+        post_dir = os.path.join(temp_dir, "content", entry["type"], entry["slug"])
+        if os.path.isdir(post_dir):
+            return post_dir
+    # Posts published before sources were recorded are found by their slug.
+    post_dir = os.path.join(temp_dir, "content", content_type, plan["slug"])
+    return post_dir if os.path.isdir(post_dir) else None
+
+def update_post_from_source(plan, post_dir, secret_repo_dir, public_key):
+    """
+    Applies an edited source file to an existing post. The stored frontmatter is
+    kept (keys set in the source override it, except the publish date), images
+    already in the cache are not uploaded again and only new or changed secret
+    spans are encrypted. Returns True if the post or its secrets changed.
+    """
+    import frontmatter
+
+    index_md_path = os.path.join(post_dir, "index.md")
+    with open(index_md_path, "r", encoding='utf-8') as f:
+        raw_frontmatter, stored_body = split_frontmatter(f.read())
+    metadata = (frontmatter.YAMLHandler().load(raw_frontmatter) if raw_frontmatter else None) or {}
+    new_metadata = dict(metadata)
+    new_metadata.update((key, value) for key, value in plan["source"].metadata.items() if key != "date")
+    title = str(new_metadata.get("title") or plan["title"])
+
+    path_to_url_map = {}
+    if plan["images"]:
+        url_map = upload_images(builtins.list(dict.fromkeys(plan["images"].values())))
+        if not url_map:
+            raise RuntimeError("image upload failed or returned incomplete results")
+        path_to_url_map = {original: url_map[abs_path] for original, abs_path in plan["images"].items()}
+
+    title_hash = hashlib.sha256(title.encode('utf-8')).hexdigest() if secret_repo_dir else None
+    body, secret_content = rewrite_markdown(plan["source"].content, path_to_url_map, title_hash)
+
+    secrets_changed = False
+    if secret_repo_dir:
+        secret_filepath = os.path.join(secret_repo_dir, f"{title_hash}.json")
+        previous = load_secret_file(secret_filepath)
+        if secret_content:
+            write_secret_file(secret_repo_dir, title_hash, secret_content, public_key)
+            secrets_changed = load_secret_file(secret_filepath) != previous
+        elif os.path.exists(secret_filepath):
+            # Every span was removed from the source, so the post has no secrets left.
+            remove_secret_post(secret_repo_dir, title_hash)
+            secrets_changed = True
+
+    body_changed = body.strip() != stored_body.strip()
+    if not body_changed and new_metadata == metadata:
+        return secrets_changed
+
+    now = datetime.datetime.now().astimezone().replace(microsecond=0).isoformat()
+    if new_metadata != metadata:
+        if "lastmod" in metadata:
+            new_metadata["lastmod"] = now
+        raw_frontmatter = frontmatter.YAMLHandler().export(new_metadata, sort_keys=False)
+    elif raw_frontmatter:
+        # Rewriting only the lastmod line keeps the stored frontmatter byte for byte.
+        raw_frontmatter = re.sub(r"^lastmod:.*$", f"lastmod: {now}", raw_frontmatter, flags=re.MULTILINE)
+    write_file_if_changed(index_md_path, f"---\n{raw_frontmatter}\n---\n\n{body.strip()}\n")
+    return True
+
+def scan_source_mtimes(directory):
+    """Returns {path: mtime} for every markdown file below directory."""
+    mtimes = {}
+    for path in resolve_source_files(directory):
+        try:
+            mtimes[path] = os.stat(path).st_mtime_ns
+        except OSError:
+            pass
+    return mtimes
+
+def iter_source_changes(directory, tick):
+    """
+    Yields the set of markdown files changed below directory, at least every
+    tick seconds (an empty set when nothing happened). Uses watchdog (inotify on
+    Linux) when it is installed and falls back to polling modification times.
+    """
+    import queue
+
+    try:
+        from watchdog.observers import Observer
+        from watchdog.events import FileSystemEventHandler
+    except ImportError:
+        mtimes = scan_source_mtimes(directory)
+        while True:
+            time.sleep(max(tick, WATCH_POLL_INTERVAL))
+            current = scan_source_mtimes(directory)
+            yield {path for path, mtime in current.items() if mtimes.get(path) != mtime}
+            mtimes = current
+
+    events = queue.Queue()
+
+    class SourceEventHandler(FileSystemEventHandler):
+        def on_any_event(self, event):
+            # Reading a file fires open/close events too; only writes matter here.
+            if event.is_directory or event.event_type not in ("created", "modified", "moved"):
+                return
+            # Editors often save through a temporary file that is renamed into place.
+            for path in (event.src_path, getattr(event, "dest_path", "")):
+                if path and path.endswith(".md"):
+                    events.put(os.path.abspath(path))
+
+    observer = Observer()
+    observer.schedule(SourceEventHandler(), directory, recursive=True)
+    observer.start()
+    try:
+        while True:
+            changed = set()
+            try:
+                changed.add(events.get(timeout=tick))
+                while True:
+                    changed.add(events.get_nowait())
+            except queue.Empty:
+                pass
+            yield changed
+    finally:
+        observer.stop()
+        observer.join()
+
+@traced("watch update")
+def apply_source_change(source_path, temp_dir, content_type, secret_repo_dir, public_key):
+    """Publishes one changed source file into the local checkout. Returns True if anything changed."""
+    plan = load_batch_source(source_path)
+    post_dir = find_post_for_source(temp_dir, plan, content_type)
+    if post_dir:
+        changed = update_post_from_source(plan, post_dir, secret_repo_dir, public_key)
+        if changed:
+            click.echo(f"Updated '{os.path.basename(post_dir)}' from {source_path}.")
+        return changed
+
+    content_dir = os.path.join(temp_dir, "content", content_type)
+    url_map = {}
+    if plan["images"]:
+        url_map = upload_images(builtins.list(dict.fromkeys(plan["images"].values())))
+        if not url_map:
+            raise RuntimeError("image upload failed or returned incomplete results")
+    os.makedirs(content_dir, exist_ok=True)
+    write_batch_post(plan, content_dir, content_type, url_map, secret_repo_dir, public_key)
+    record_source(source_path, content_type, plan["slug"])
+    click.echo(f"Created '{plan['slug']}' from {source_path}.")
+    return True
+
+# --- Link Checking ---
+# `check` collects every external link and remote image from the posts and
+# probes them on a thread pool sharing one pooled session, with at most
+# --per-host requests to any single host. Results are cached in
+# ~/.blog_uploader/link_cache.json: working URLs are trusted for the TTL and
+# then revalidated with their ETag or Last-Modified, while broken ones are
+# checked again on every run.
+
+MARKDOWN_LINK_PATTERN = re.compile(r'\]\(\s*<?(https?://[^\s()<>]+(?:\([^\s()]*\)[^\s()<>]*)*)')
+# Bare URLs stop at CJK text and full-width punctuation, which often follow them without a space.
+BARE_URL_PATTERN = re.compile(r'(src=["\']?)?(https?://[^\s<>"\'`\[\]()　-〿㐀-鿿豈-﫿＀-￯]+)')
+URL_TRAILING_PUNCTUATION = ".,;:!?*_~'\""
+DEFAULT_LINK_CHECK_TTL = 24 * 3600
+LINK_CHECK_USER_AGENT = "Mozilla/5.0 (compatible; blog-uploader link checker)"
+
+def get_link_cache_path():
+    """Returns the path to the cache of link check results."""
+    home_dir = os.path.expanduser("~")
+    return os.path.join(home_dir, ".blog_uploader", "link_cache.json")
+
+def load_link_cache():
+    """Loads the link check cache."""
+    cache_path = get_link_cache_path()
+    if os.path.exists(cache_path):
+        try:
+            with open(cache_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            pass
+    return {}
+
+def clean_url(url):
+    """Strips punctuation that ended the sentence rather than the URL; returns None if no host is left."""
+    from urllib.parse import urlsplit
+
+    url = url.rstrip(URL_TRAILING_PUNCTUATION)
+    try:
+        return url if urlsplit(url).hostname else None
+    except ValueError:
+        return None
+
+def extract_external_links(text):
+    """
+    Returns {url: "image" or "link"} for every http(s) URL in a post, skipping
+    code. Markdown images and src= attributes count as images.
+    """
+    raw_frontmatter, body = split_frontmatter(text)
+    found = {}
+
+    def add(url, kind):
+        url = clean_url(url)
+        if url and found.get(url) != "image":
+            found[url] = kind
+
+    def add_bare_urls(chunk):
+        for match in BARE_URL_PATTERN.finditer(chunk):
+            add(match.group(2), "image" if match.group(1) else "link")
+
+    for token in iter_tokens(tokenize_markdown(body)):
+        if token[0] == "image":
+            target = token[3].split()
+            if target and REMOTE_URL_PATTERN.match(target[0]):
+                add(target[0].strip("<>"), "image")
+        elif token[0] == "text":
+            chunk = token[1]
+            for match in MARKDOWN_LINK_PATTERN.finditer(chunk):
+                add(match.group(1), "link")
+            # Drop the link targets so the bare URL pass does not see them again.
+            add_bare_urls(MARKDOWN_LINK_PATTERN.sub("](", chunk))
+    if raw_frontmatter:
+        add_bare_urls(raw_frontmatter)
+    return found
+
+def collect_site_links(site_dir):
+    """Returns {url: {"kind", "posts"}} for the external URLs in content/**/index.md."""
+    content_dir = os.path.join(site_dir, "content")
+    links = {}
+    for path in sorted(glob.glob(os.path.join(content_dir, "**", "index.md"), recursive=True)):
+        name = os.path.relpath(os.path.dirname(path), content_dir).replace(os.sep, "/")
+        with open(path, 'r', encoding='utf-8') as f:
+            text = f.read()
+        for url, kind in extract_external_links(text).items():
+            entry = links.setdefault(url, {"kind": kind, "posts": []})
+            if kind == "image":
+                entry["kind"] = kind
+            entry["posts"].append(name)
+    return links
+
+def probe_url(session, url, cached, timeout):
+    """
+    Requests url and returns its check result. HEAD is tried first and GET is
+    used if the server refuses it. A previously working URL is revalidated with
+    its ETag or Last-Modified, so an unchanged resource costs only a 304.
+    """
+    import requests
+
+    headers = {"User-Agent": LINK_CHECK_USER_AGENT}
+    if cached and cached.get("ok"):
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+    start = time.perf_counter()
+    try:
+        response = session.head(url, headers=headers, timeout=timeout, allow_redirects=True)
+        if response.status_code >= 400:
+            # Plenty of servers answer HEAD with 403, 404 or 405 while GET works.
+            response = session.get(url, headers=headers, timeout=timeout, allow_redirects=True, stream=True)
+            response.close()
+    except requests.exceptions.RequestException as e:
+        return {"ok": False, "status": None, "error": type(e).__name__, "elapsed": round(time.perf_counter() - start, 3), "checked": time.time()}
+    elapsed = round(time.perf_counter() - start, 3)
+
+    if response.status_code == 304 and cached:
+        return dict(cached, elapsed=elapsed, checked=time.time())
+    return {
+        "ok": response.status_code < 400,
+        "status": response.status_code,
+        "elapsed": elapsed,
+        "checked": time.time(),
+        "etag": response.headers.get("ETag"),
+        "last_modified": response.headers.get("Last-Modified"),
+    }
+
+@traced("check_links")
+def check_links(urls, concurrency=32, per_host=4, timeout=10.0, ttl=DEFAULT_LINK_CHECK_TTL, refresh=False):
+    """
+    Checks urls and returns {url: result}. Working URLs checked less than ttl
+    seconds ago are taken from the cache (their result has "cached": True).
+    """
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    from itertools import zip_longest
+    from urllib.parse import urlsplit
+    from rich.progress import Progress
+    import requests
+    from requests.adapters import HTTPAdapter
+
+    cache = load_link_cache()
+    now = time.time()
+    results = {}
+    by_host = {}
+    for url in urls:
+        cached = cache.get(url)
+        if cached and cached.get("ok") and not refresh and now - cached.get("checked", 0) < ttl:
+            results[url] = dict(cached, cached=True)
+        else:
+            by_host.setdefault(urlsplit(url).hostname, []).append(url)
+    if not by_host:
+        return results
+
+    # Interleaving the hosts keeps workers from queueing behind one host's limit.
+    pending = [url for group in zip_longest(*by_host.values()) for url in group if url]
+    limits = {host: threading.BoundedSemaphore(per_host) for host in by_host}
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=min(len(by_host), 100), pool_maxsize=per_host)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    def probe(url):
+        with limits[urlsplit(url).hostname]:
+            return probe_url(session, url, cache.get(url), timeout)
+
+    with session, Progress(transient=True) as progress:
+        task = progress.add_task("Checking links", total=len(pending))
+        with ThreadPoolExecutor(max_workers=min(concurrency, len(pending))) as executor:
+            futures = {executor.submit(inherit_trace(probe), url): url for url in pending}
+            for future in as_completed(futures):
+                results[futures[future]] = cache[futures[future]] = future.result()
+                progress.advance(task)
+
+    # Forget URLs that have not been checked for a month, so removed links do not pile up.
+    for url in [url for url, result in cache.items() if now - result.get("checked", 0) > 30 * 24 * 3600]:
+        del cache[url]
+    write_json_atomic(get_link_cache_path(), cache)
+    return results
+
+# --- Publish Journal ---
+# Publishing a single post is a chain of stages, and each one that completes is
+# recorded with its results in ~/.blog_uploader/journal/<id>.json. Those results
+# include the rewritten markdown after the upload, the edited draft, and copies
+# of the files written to each checkout. If a later stage fails, typically a push
+# on a flaky network, `resume` restores those files and continues at the first
+# incomplete stage. Images are not uploaded again, the editor is not reopened,
+# secrets are not re-encrypted and the site is not rebuilt.
+
+PUBLISH_STAGES = ["upload", "edit", "secrets", "place", "build", "commit", "push"]
+DRAFT_DIR_NAME = "untitled-post"
+
+def get_journal_dir():
+    """Returns the directory holding the journals of unfinished publishes."""
+    home_dir = os.path.expanduser("~")
+    return os.path.join(home_dir, ".blog_uploader", "journal")
+
+def get_journal_path(journal_id):
+    return os.path.join(get_journal_dir(), f"{journal_id}.json")
+
+def create_journal(**inputs):
+    """Starts the journal of a new publish with the given inputs."""
+    journal_id = time.strftime("%Y%m%d-%H%M%S") + "-" + os.urandom(3).hex()
+    journal = {"id": journal_id, "created": time.time(), "inputs": inputs, "stages": {}, "files": {}}
+    save_journal(journal)
+    return journal
+
+def save_journal(journal):
+    write_json_atomic(get_journal_path(journal["id"]), journal, indent=2)
+
+def load_journals():
+    """Returns the journals of all unfinished publishes, oldest first."""
+    journals = []
+    for path in glob.glob(os.path.join(get_journal_dir(), "*.json")):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                journals.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    return sorted(journals, key=lambda journal: journal["created"])
+
+def journal_stage(journal, stage, **outputs):
+    """Records stage as completed, together with what it produced."""
+    if journal is None:
+        return
+    journal["stages"][stage] = dict(outputs, completed=time.time())
+    save_journal(journal)
+
+def next_journal_stage(journal):
+    """Returns the first stage of the publish that has not completed."""
+    return next((stage for stage in PUBLISH_STAGES if stage not in journal["stages"]), None)
+
+def finish_journal(journal):
+    """Deletes the journal of a publish that completed or was aborted."""
+    if journal is None:
+        return
+    shutil.rmtree(os.path.join(get_journal_dir(), journal["id"]), ignore_errors=True)
+    if os.path.exists(get_journal_path(journal["id"])):
+        os.remove(get_journal_path(journal["id"]))
+
+def list_planned_paths(repo_path):
+    """Returns the paths planned so far inside repo_path, relative to it, without taking them."""
+    root = os.path.abspath(repo_path) + os.sep
+    with PUBLISH_PLAN_LOCK:
+        paths = [path for path in PUBLISH_PLAN["paths"] if path.startswith(root)]
+    return sorted(os.path.relpath(path, repo_path) for path in paths)
+
+def save_journal_files(journal, name, directory, rel_paths):
+    """
+    Copies the given files of directory into the journal under name, replacing
+    an earlier copy. Paths that no longer exist are recorded as deletions.
+    """
+    copy_dir = os.path.join(get_journal_dir(), journal["id"], name)
+    shutil.rmtree(copy_dir, ignore_errors=True)
+    files = {}
+    for rel_path in rel_paths:
+        path = os.path.join(directory, rel_path)
+        files[rel_path] = os.path.isfile(path)
+        if files[rel_path]:
+            os.makedirs(os.path.dirname(os.path.join(copy_dir, rel_path)), exist_ok=True)
+            shutil.copyfile(path, os.path.join(copy_dir, rel_path))
+    journal["files"][name] = files
+    save_journal(journal)
+
+def restore_journal_files(journal, name, directory, plan=True):
+    """
+    Writes the files saved under name back into directory and, unless plan is
+    False, plans them for the next commit.
+    """
+    copy_dir = os.path.join(get_journal_dir(), journal["id"], name)
+    for rel_path, exists in journal["files"].get(name, {}).items():
+        path = os.path.join(directory, rel_path)
+        if not plan:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            shutil.copyfile(os.path.join(copy_dir, rel_path), path)
+            continue
+        if exists:
+            with open(os.path.join(copy_dir, rel_path), 'rb') as f:
+                write_file_if_changed(path, f.read())
+        else:
+            remove_path(path)
+        plan_path(path)
+
+def get_journal_draft_path(journal, temp_dir):
+    """Returns the directory the draft of journal is edited in, which no other publish shares."""
+    content_type = journal["inputs"]["content_type"]
+    return os.path.join(temp_dir, "content", content_type, f"{DRAFT_DIR_NAME}-{journal['id']}")
+
+def discard_journal(journal):
+    """
+    Undoes what an unfinished publish left behind, as an abort would: its draft,
+    the files it wrote to both checkouts and any commit that was not pushed.
+    """
+    base_dir = os.path.join(os.path.expanduser("~"), ".blog_uploader")
+    temp_dir = os.path.join(base_dir, TEMP_DIR_NAME)
+    repos = {"main": temp_dir, "secret": os.path.join(base_dir, SECRET_TEMP_DIR_NAME)}
+    shutil.rmtree(get_journal_draft_path(journal, temp_dir), ignore_errors=True)
+    for name, repo_dir in repos.items():
+        if not os.path.isdir(repo_dir):
+            continue
+        if name in journal["stages"].get("commit", {}):
+            reset_to_upstream(repo_dir)
+        for rel_path in journal["files"].get(name, {}):
+            plan_path(os.path.join(repo_dir, rel_path))
+        discard_local_changes(repo_dir)
+    finish_journal(journal)
+
+def run_journaled(journal):
+    """Runs the publish of journal and points to `resume` if it stops before the end."""
+    try:
+        run_publish(journal)
+    except BaseException:
+        if os.path.exists(get_journal_path(journal["id"])):
+            click.echo(
+                f"Progress has been saved. Run 'blog-uploader resume' to continue "
+                f"from the '{next_journal_stage(journal)}' stage.", err=True
+            )
+        raise
+
+def run_publish(journal):
+    """
+    Publishes a single post through the stages of journal. Stages that already
+    completed are skipped, and the files they wrote are restored instead.
+    """
+    import frontmatter
+    from slugify import slugify
+
+    inputs = journal["inputs"]
+    filepath, content_type, skip_build = inputs["filepath"], inputs["content_type"], inputs["skip_build"]
+    stages = journal["stages"]
+
+    temp_dir, secret_repo_dir = sync_all_repos() # Ensure both repos are ready
+    content_path = os.path.join("content", content_type)
+    new_post_path = get_journal_draft_path(journal, temp_dir)
+    index_md_path = os.path.join(new_post_path, "index.md")
+    restore_journal_files(journal, "main", temp_dir)
+    restore_journal_files(journal, "secret", secret_repo_dir)
+    if "edit" in stages and "place" not in stages:
+        shutil.rmtree(new_post_path, ignore_errors=True)
+        restore_journal_files(journal, "draft", new_post_path, plan=False)
+
+    def abort(message, err=False):
+        click.echo(message, err=err)
+        if os.path.exists(new_post_path):
+            shutil.rmtree(new_post_path)
+        if stages.get("secrets", {}).get("has_secrets"):
+            discard_local_changes(secret_repo_dir)
+        finish_journal(journal)
+
+    # 0. Preprocess the markdown file to upload images
+    if "upload" not in stages:
+        click.echo("Preprocessing markdown file...")
+        with open(filepath, "r", encoding='utf-8') as f_src:
+            original_content = f_src.read()
+        source_dir = os.path.dirname(os.path.abspath(filepath))
+        journal_stage(journal, "upload", content=preprocess_markdown_content(original_content, source_dir))
+
+    if "edit" not in stages:
+        if os.path.exists(index_md_path):
+            # The draft directory is named after this journal, so it is never another run's draft.
+            click.echo("Reopening the draft left by the interrupted run.")
+        else:
+            # 1. Create a new post using Hugo. The archetype names the post after its
+            # directory, so it is created under the generic name and then moved.
+            click.echo(f"Creating new {content_type} with Hugo...")
+            hugo_draft_path = os.path.join(temp_dir, content_path, DRAFT_DIR_NAME)
+            shutil.rmtree(hugo_draft_path, ignore_errors=True)
+            shutil.rmtree(new_post_path, ignore_errors=True)
+            run_hugo(["new", f"{content_type}/{DRAFT_DIR_NAME}/index.md"], temp_dir)
+            os.replace(hugo_draft_path, new_post_path)
+
+            # 2. Append content from the source file
+            with open(index_md_path, "a", encoding='utf-8') as f_dest:
+                f_dest.write("\n" + stages["upload"]["content"])
+            click.echo(f"Content from {filepath} has been added.")
+
+        # 3. Open with Typora
+        open_with_typora(index_md_path)
+        click.echo(f"Please edit the post file to set the headers: {index_md_path}")
+
+        # 4. Prompt user to confirm after editing
+        if not click.confirm("Have you finished editing and set the headers?"):
+            abort("Aborted.")
+            return
+        save_journal_files(journal, "draft", new_post_path, builtins.list(read_directory(new_post_path)))
+        journal_stage(journal, "edit")
+
+    # 5. Read the title and process secret content
+    if "secrets" not in stages:
+        with open(index_md_path, "r", encoding='utf-8') as f:
+            full_content_string = f.read()
+
+        raw_frontmatter, body = split_frontmatter(full_content_string)
+        metadata = frontmatter.YAMLHandler().load(raw_frontmatter) if raw_frontmatter else None
+        title = (metadata or {}).get("title", "")
+
+        if not title:
+            abort("Could not find title in the markdown file. Aborting.", err=True)
+            return
+
+        title_hash = hashlib.sha256(str(title).encode('utf-8')).hexdigest()
+        clean_content, secret_content = process_strikethrough_content(title_hash, body)
+
+        if secret_content:
+            public_key = get_or_setup_public_key()
+            secret_filepath = write_secret_file(secret_repo_dir, title_hash, secret_content, public_key)
+
+            click.echo(f"Secret content encrypted and saved to {secret_filepath}")
+
+            # Update the main post file with the clean content, preserving original frontmatter
+            new_full_content = f"---\n{raw_frontmatter}\n---\n{clean_content}"
+            with open(index_md_path, 'w', encoding='utf-8') as f:
+                f.write(new_full_content)
+            save_journal_files(journal, "draft", new_post_path, builtins.list(read_directory(new_post_path)))
+            save_journal_files(journal, "secret", secret_repo_dir, list_planned_paths(secret_repo_dir))
+        journal_stage(journal, "secrets", has_secrets=bool(secret_content))
+    has_secrets = stages["secrets"]["has_secrets"]
+
+    if "place" not in stages:
+        # 6. Read the title and rename the directory
+        title = ""
+        with open(index_md_path, "r", encoding='utf-8') as f:
+            for line in f:
+                if line.lower().startswith("title:"):
+                    title = line.split(":", 1)[1].strip().replace('"', '').replace("'", "")
+                    break
+
+        if not title:
+            abort("Could not find title in the markdown file. Aborting.", err=True)
+            return
+
+        # Sanitize title to be a valid directory name
+        safe_title = slugify(title)
+        final_post_path = os.path.join(temp_dir, content_path, safe_title)
+
+        if os.path.exists(final_post_path):
+            if not click.confirm(f"Post '{safe_title}' already exists. Overwrite?"):
+                abort("Aborted.")
+                return
+
+        # Move the draft into place file by file, so re-publishing a post only
+        # rewrites (and commits) the files that actually changed.
+        sync_directory(final_post_path, read_directory(new_post_path))
+        shutil.rmtree(new_post_path)
+        click.echo(f"Post renamed to '{safe_title}'.")
+        record_source(filepath, content_type, safe_title)
+        save_journal_files(journal, "main", temp_dir, list_planned_paths(temp_dir))
+        journal_stage(journal, "place", title=title, slug=safe_title)
+    title = stages["place"]["title"]
+
+    # 7. Run hugo, commit and push
+    if "build" not in stages:
+        build_site(temp_dir, skip_build)
+        save_journal_files(journal, "main", temp_dir, list_planned_paths(temp_dir))
+        journal_stage(journal, "build")
+
+    # The secret commit is pushed together with the post, and rolled back if the post push fails.
+    publish_changes(
+        temp_dir, f"Add new post: {title}",
+        secret_repo_dir if has_secrets else None, f"Add secret for post: {title}",
+        journal=journal,
+    )
+
+# --- CLI Commands ---
+
+@click.group()
+@click.option('--offline', is_flag=True, help='Never contact the remotes; work on the local checkouts as they are.')
+@click.option('--sync-ttl', type=int, default=None, help='Seconds a read-only command trusts the last fetch (default: sync_ttl in config, or 300).')
+@click.option('--profile', is_flag=True, help='Print a timing summary of every phase when the command finishes.')
+@click.option('--trace-file', type=click.Path(dir_okay=False), default=None, help='Write the phase timings to this file in Chrome trace format.')
+@click.pass_context
+def cli(ctx, offline, sync_ttl, profile, trace_file):
+    """A CLI tool to manage your Hugo blog posts."""
+    RUNTIME_OPTIONS.clear()
+    RUNTIME_OPTIONS.update(offline=offline, sync_ttl=sync_ttl)
+    if profile:
+        ctx.call_on_close(print_profile_summary)
+    if trace_file:
+        ctx.call_on_close(lambda: write_chrome_trace(trace_file))
+    # Closed last, so the command span is recorded before the callbacks above run.
+    ctx.with_resource(trace_span(ctx.invoked_subcommand or "cli"))
+
+@cli.command()
+@click.argument('filepath')
+@click.option('--type', 'content_type', default='post', help='The type of content to create (e.g., post, thought).')
+@click.option('--jobs', '-j', type=int, default=4, help='Worker threads used when publishing a directory or glob.')
+@click.option('--skip-build/--build', 'skip_build', default=None, help='Skip the local hugo build and let the deployment build the site (default: skip_local_build in config).')
+def new(filepath, content_type, jobs, skip_build):
+    """Create a new blog post from a file, or publish a directory or glob of files in one go."""
+    if content_type not in ['post', 'thought']:
+        click.echo(f"Invalid content type '{content_type}'. Please use 'post' or 'thought'.", err=True)
+        return
+
+    batch = os.path.isdir(filepath) or glob.has_magic(filepath)
+    # A single post is always created with 'hugo new'; a batch only needs hugo to build.
+    if not batch or not resolve_skip_build(skip_build):
+        check_hugo_installed()
+
+    if batch:
+        source_files = resolve_source_files(filepath)
+        if not source_files:
+            click.echo(f"No markdown files found in '{filepath}'.", err=True)
+            return
+        publish_batch(source_files, content_type, jobs, skip_build)
+        return
+    if not os.path.isfile(filepath):
+        click.echo(f"Error: File '{filepath}' does not exist.", err=True)
+        return
+
+    journal = create_journal(filepath=os.path.abspath(filepath), content_type=content_type, skip_build=skip_build)
+    run_journaled(journal)
+
+@cli.command()
+@click.argument('journal_id', required=False)
+@click.option('--discard', is_flag=True, help='Delete the journal instead of resuming it.')
+def resume(journal_id, discard):
+    """Continue an interrupted 'new' from its first incomplete stage."""
+    journals = load_journals()
+    if journal_id:
+        journals = [journal for journal in journals if journal["id"] == journal_id]
+        if not journals:
+            click.echo(f"Error: No interrupted publish with id '{journal_id}'.", err=True)
+            sys.exit(1)
+    if not journals:
+        click.echo("There is no interrupted publish to resume.")
+        return
+
+    journal = journals[-1]
+    others = [other["id"] for other in journals[:-1]]
+    if others:
+        click.echo(f"Other interrupted publishes: {', '.join(others)}")
+    inputs = journal["inputs"]
+    stage = next_journal_stage(journal)
+    if discard:
+        discard_journal(journal)
+        click.echo(f"Discarded the publish of {inputs['filepath']} ({journal['id']}).")
+        return
+
+    click.echo(f"Resuming the publish of {inputs['filepath']} at the '{stage}' stage.")
+    if stage in ("upload", "edit") or (stage in ("secrets", "place", "build") and not resolve_skip_build(inputs["skip_build"])):
+        check_hugo_installed()
+    run_journaled(journal)
+
+@cli.command()
+@click.argument('name')
+@click.option('--type', 'content_type', default='post', help='The type of content to remove (e.g., post, thought).')
+@click.option('--skip-build/--build', 'skip_build', default=None, help='Skip the local hugo build and let the deployment build the site (default: skip_local_build in config).')
+def remove(name, content_type, skip_build):
+    """Remove a blog post by its folder name."""
+    from slugify import slugify
+
+    if content_type not in ['post', 'thought']:
+        click.echo(f"Invalid content type '{content_type}'. Please use 'post' or 'thought'.", err=True)
+        return
+    if not resolve_skip_build(skip_build):
+        check_hugo_installed()
+    name = slugify(name)
+    temp_dir, secret_repo_dir = sync_all_repos()
+    content_path = os.path.join("content", content_type)
+    post_path = os.path.join(temp_dir, content_path, name)
+
+    if not os.path.exists(post_path):
+        click.echo(f"Error: Post '{name}' not found.", err=True)
+        return
+
+    if click.confirm(f"Are you sure you want to delete the post '{name}'?"):
+        # Secrets are stored under the hash of the title, so it must be read before the post is gone.
+        title = parse_post_metadata(os.path.join(post_path, "index.md"))["title"]
+        remove_path(post_path)
+        click.echo(f"Post '{name}' has been deleted.")
+        title_hash = hashlib.sha256(title.encode('utf-8')).hexdigest()
+        if os.path.exists(os.path.join(secret_repo_dir, f"{title_hash}.json")):
+            remove_secret_post(secret_repo_dir, title_hash)
+            click.echo(f"Secrets of '{name}' have been deleted.")
+        
+        # Run hugo, commit and push
+        build_site(temp_dir, skip_build)
+        
+        publish_changes(temp_dir, f"Remove post: {name}", secret_repo_dir, f"Remove secret for post: {name}")
+    else:
+        click.echo("Aborted.")
+
+@cli.command()
+@click.argument('name')
+@click.argument('filepath', type=click.Path(exists=True, dir_okay=False))
+@click.option('--type', 'content_type', default='post', help='The type of content to update (e.g., post, thought).')
+@click.option('--yes', '-y', is_flag=True, help='Publish without showing the diff, answering every prompt with its default.')
+@click.option('--skip-build/--build', 'skip_build', default=None, help='Skip the local hugo build and let the deployment build the site (default: skip_local_build in config).')
+def update(name, filepath, content_type, yes, skip_build):
+    """Update an existing post in place from an edited source file."""
+    import git
+    from slugify import slugify
+
+    if content_type not in ['post', 'thought']:
+        click.echo(f"Invalid content type '{content_type}'. Please use 'post' or 'thought'.", err=True)
+        return
+    if not resolve_skip_build(skip_build):
+        check_hugo_installed()
+    name = slugify(name)
+    temp_dir, secret_repo_dir = sync_all_repos()
+    post_path = os.path.join(temp_dir, "content", content_type, name)
+
+    if not os.path.exists(post_path):
+        click.echo(f"Error: Post '{name}' not found.", err=True)
+        return
+
+    try:
+        plan = load_batch_source(filepath)
+    except Exception as e:
+        click.echo(f"Failed to read '{filepath}': {e}", err=True)
+        sys.exit(1)
+
+    public_key = None
+    if plan["has_secrets"]:
+        if yes or click.confirm("Found strikethrough text. Do you want to separate this content into the secret repository?", default=True):
+            public_key = get_or_setup_public_key()
+        else:
+            secret_repo_dir = None
+
+    try:
+        changed = update_post_from_source(plan, post_path, secret_repo_dir, public_key)
+    except Exception as e:
+        click.echo(f"Failed to update the post: {e}", err=True)
+        discard_local_changes(temp_dir)
+        if secret_repo_dir:
+            discard_local_changes(secret_repo_dir)
+        sys.exit(1)
+    if not changed:
+        click.echo(f"Post '{name}' is already up to date.")
+        return
+
+    if not yes:
+        diff = git.Repo(temp_dir).git.diff("--", os.path.relpath(post_path, temp_dir))
+        for line in diff.splitlines():
+            color = "green" if line.startswith("+") else "red" if line.startswith("-") else None
+            click.echo(click.style(line, fg=color))
+        if not click.confirm(f"Publish these changes to '{name}'?"):
+            click.echo("Aborted.")
+            discard_local_changes(temp_dir)
+            if secret_repo_dir:
+                discard_local_changes(secret_repo_dir)
+            return
+    record_source(filepath, content_type, name)
+
+    title = parse_post_metadata(os.path.join(post_path, "index.md"))["title"]
+    build_site(temp_dir, skip_build)
+    publish_changes(temp_dir, f"Update post: {title}", secret_repo_dir, f"Update secret for post: {title}")
+
+@cli.command()
+@click.argument('directory', type=click.Path(exists=True, file_okay=False))
+@click.option('--type', 'content_type', default='post', help='The type of content new source files are published as (e.g., post, thought).')
+@click.option('--debounce', type=float, default=2.0, help='Seconds a file must stay unchanged before it is republished.')
+@click.option('--commit-interval', type=float, default=60.0, help='Seconds between commits; edits made in between share one commit.')
+@click.option('--skip-build/--build', 'skip_build', default=None, help='Skip the local hugo build and let the deployment build the site (default: skip_local_build in config).')
+def watch(directory, content_type, debounce, commit_interval, skip_build):
+    """Watch a directory of source files and republish posts as they change."""
+    if content_type not in ['post', 'thought']:
+        click.echo(f"Invalid content type '{content_type}'. Please use 'post' or 'thought'.", err=True)
+        return
+    if not resolve_skip_build(skip_build):
+        check_hugo_installed()
+
+    directory = os.path.abspath(directory)
+    temp_dir, secret_repo_dir = sync_all_repos()
+    public_key = None
+    if click.confirm("Separate strikethrough text into the secret repository?", default=True):
+        public_key = get_or_setup_public_key()
+    else:
+        secret_repo_dir = None
+
+    def flush(sources):
+        """
+        Applies the changed sources to freshly pulled checkouts, commits and
+        pushes them. Returns the sources that must be tried again.
+        """
+        # The remote may have moved since the last flush; a push from a stale checkout is rejected.
+        try:
+            sync_all_repos()
+        except (SystemExit, Exception) as e:
+            click.echo(f"Failed to pull the repositories ({e}); retrying with the next commit.", err=True)
+            return sources
+        applied = set()
+        for path in sorted(sources):
+            if not os.path.isfile(path):
+                continue
+            try:
+                if apply_source_change(path, temp_dir, content_type, secret_repo_dir, public_key):
+                    applied.add(path)
+            except Exception as e:
+                click.echo(f"Failed to publish {path}: {e}", err=True)
+        if not applied:
+            return set()
+
+        names = sorted(os.path.splitext(os.path.basename(path))[0] for path in applied)
+        message = f"Update {len(names)} posts: {', '.join(names)}"
+        try:
+            build_site(temp_dir, skip_build)
+            publish_changes(temp_dir, message, secret_repo_dir, f"Update secrets for {len(names)} posts")
+        except (SystemExit, Exception):
+            # Drop the changes a failed build left uncommitted and the commits that were
+            # never pushed, so the next pull fast-forwards, then rebuild posts and
+            # secrets from the sources on top of it.
+            for repo_dir in filter(None, (temp_dir, secret_repo_dir)):
+                try:
+                    discard_local_changes(repo_dir)
+                    reset_to_upstream(repo_dir)
+                except Exception as e:
+                    click.echo(f"Failed to reset {repo_dir}: {e}", err=True)
+            click.echo(f"Publishing failed; {len(applied)} sources will be published again with the next commit.", err=True)
+            return applied
+        return set()
+
+    click.echo(f"Watching {directory} for changes. Press Ctrl+C to stop.")
+    pending = {}
+    changed_sources = set()
+    last_commit = time.monotonic()
+    try:
+        for changed in iter_source_changes(directory, tick=min(debounce, 0.5) or 0.5):
+            now = time.monotonic()
+            for path in changed:
+                pending[path] = now
+            # Saving a file usually fires several events; wait until it settles.
+            for path in [path for path, seen in pending.items() if now - seen >= debounce]:
+                del pending[path]
+                if os.path.isfile(path):
+                    changed_sources.add(path)
+            if changed_sources and now - last_commit >= commit_interval:
+                changed_sources = flush(changed_sources)
+                last_commit = now
+    except KeyboardInterrupt:
+        if changed_sources:
+            click.echo("Publishing the remaining changes...")
+            flush(changed_sources)
+        click.echo("Stopped watching.")
+
+@cli.command(name="list")
+@click.option('--type', 'content_type', default=None, help='The type of content to list (e.g., post, thought). Lists all types if not specified.')
+@click.option('--sort', 'sort_key', type=click.Choice(['name', 'date', 'title', 'type', 'words']), default='name', help='Column to sort by.')
+@click.option('--reverse', is_flag=True, help='Reverse the sort order.')
+@click.option('--filter', 'filters', multiple=True, help='Filter as KEY=VALUE on type, category or date (prefix like 2025-03, or range like 2025-01..2025-06). Can be repeated.')
+def list_posts(content_type, sort_key, reverse, filters):
+    """List all available blog posts in a table."""
+    from rich.console import Console
+    from rich.table import Table
+
+    if content_type and content_type not in CONTENT_TYPES:
+        click.echo(f"Invalid content type '{content_type}'. Please use 'post' or 'thought'.", err=True)
+        return
+
+    filters = parse_list_filters(filters)
+    if content_type:
+        filters["type"] = content_type
+
+    temp_dir = get_temp_dir(read_only=True)
+    entries = [entry for entry in update_post_index(temp_dir).values() if entry_matches_filters(entry, filters)]
+
+    if not entries:
+        click.echo("No content found.")
+        return
+
+    sort_fields = {
+        'name': lambda e: (CONTENT_TYPES.index(e["type"]), e["name"]),
+        'date': lambda e: (e.get("date", "N/A") == "N/A", e.get("date", "")),
+        'title': lambda e: e.get("title", ""),
+        'type': lambda e: (e["type"], e["name"]),
+        'words': lambda e: e.get("word_count", 0),
+    }
+    entries.sort(key=sort_fields[sort_key], reverse=reverse)
+
+    table = Table(title="Blog Content")
+    table.add_column("Title", style="cyan", no_wrap=True)
+    table.add_column("Type", style="blue")
+    table.add_column("Date", style="magenta")
+    table.add_column("Tags", style="green")
+    table.add_column("Word Count", justify="right", style="yellow")
+
+    for entry in entries:
+        if "error" in entry:
+            table.add_row(f"[red]Error parsing {entry['name']}[/red]", entry["type"], entry["error"], "", "")
+            continue
+        tags_str = ", ".join(entry["categories"]) or "N/A"
+        table.add_row(entry["title"], entry["type"], entry["date"], tags_str, str(entry["word_count"]))
+
+    console = Console()
+    console.print(table)
+
+@cli.command()
+@click.option('--concurrency', type=click.IntRange(min=1), default=32, show_default=True, help='Maximum number of requests in flight.')
+@click.option('--per-host', type=click.IntRange(min=1), default=4, show_default=True, help='Maximum number of concurrent requests to a single host.')
+@click.option('--timeout', type=float, default=10.0, show_default=True, help='Seconds to wait for a server to respond.')
+@click.option('--slow', type=float, default=3.0, show_default=True, help='Report URLs that take longer than this many seconds.')
+@click.option('--ttl', type=int, default=None, help='Seconds a working URL is trusted without checking it again (default: link_check_ttl in config, or 86400).')
+@click.option('--refresh', is_flag=True, help='Ignore cached results and check every URL again.')
+def check(concurrency, per_host, timeout, slow, ttl, refresh):
+    """Check the external links and remote images of all posts for broken or slow URLs."""
+    from rich.console import Console
+    from rich.table import Table
+
+    temp_dir = get_temp_dir(read_only=True)
+    links = collect_site_links(temp_dir)
+    if not links:
+        click.echo("No external links found.")
+        return
+    if ttl is None:
+        ttl = load_config().get("link_check_ttl", DEFAULT_LINK_CHECK_TTL)
+
+    post_count = len({post for entry in links.values() for post in entry["posts"]})
+    click.echo(f"Checking {len(links)} external URLs from {post_count} posts...")
+    start = time.perf_counter()
+    results = check_links(builtins.list(links), concurrency, per_host, timeout, ttl, refresh)
+    elapsed = time.perf_counter() - start
+
+    broken = sorted(url for url, result in results.items() if not result["ok"])
+    slow_urls = sorted(url for url, result in results.items() if result["ok"] and result["elapsed"] > slow)
+    if broken or slow_urls:
+        table = Table(title="Link Check")
+        table.add_column("Status", no_wrap=True)
+        table.add_column("Time", justify="right", no_wrap=True)
+        table.add_column("Kind", no_wrap=True)
+        table.add_column("URL", overflow="fold")
+        table.add_column("Found In", overflow="fold")
+        for url in broken + slow_urls:
+            result = results[url]
+            style = "yellow" if result["ok"] else "red"
+            status = str(result["status"] or result.get("error"))
+            table.add_row(f"[{style}]{status}[/{style}]", f"{result['elapsed']:.2f}s", links[url]["kind"], url, ", ".join(links[url]["posts"]))
+        Console().print(table)
+
+    cached = sum(1 for result in results.values() if result.get("cached"))
+    click.echo(
+        f"Checked {len(results)} URLs in {elapsed:.1f}s ({cached} from cache): "
+        f"{len(broken)} broken, {len(slow_urls)} slower than {slow:g}s."
+    )
+    if broken:
+        sys.exit(1)
+
+@cli.command(name="index")
+@click.argument('site_dir', type=click.Path(exists=True, file_okay=False), default='.')
+def index_site(site_dir):
+    """Refresh the search index of a site directory (e.g. in the deployment build)."""
+    if not os.path.isdir(os.path.join(site_dir, "content")):
+        click.echo(f"Error: '{site_dir}' is not a Hugo site (no content directory).", err=True)
+        sys.exit(1)
+    update_search_index(os.path.abspath(site_dir))
+    click.echo("The search index is up to date.")
+
+@cli.command(name="show-private-key")
+def show_private_key():
+    """Displays the configured private key required for decryption."""
+    config = load_config()
+    private_key_path = config.get("private_key_path")
+
+    if not private_key_path or not os.path.exists(private_key_path):
+        click.echo(click.style("Private key path is not configured or the file is missing.", fg="red"))
         click.echo("Please run the 'new' command and generate a key pair when prompted.")
         sys.exit(1)
     
@@ -582,6 +3384,37 @@ def show_private_key():
     click.echo(click.style("Here is the private key required for decryption on your website:", fg="yellow"))
     click.echo(click.style(private_key, fg="cyan"))
 
+@cli.command(name="serve-images")
+@click.option('--directory', default=None, help='Directory to store uploaded images in (default: image_store.directory in config).')
+@click.option('--base-url', default=None, help='URL the directory is served under (default: image_store.base_url in config).')
+@click.option('--host', default="127.0.0.1", show_default=True, help='Address to listen on.')
+@click.option('--port', type=int, default=36677, show_default=True, help='Port to listen on (PicGo uses 36677).')
+def serve_images(directory, base_url, host, port):
+    """Runs a PicGo-compatible upload server that stores images locally."""
+    from . import image_server
+
+    settings = dict(load_config().get("image_store") or {"type": "local"})
+    if directory:
+        settings["directory"] = directory
+    if base_url:
+        settings["base_url"] = base_url
+    if "directory" not in settings or "base_url" not in settings:
+        click.echo("Error: Pass --directory and --base-url, or set image_store in the config.", err=True)
+        sys.exit(1)
+
+    try:
+        server = image_server.create_server(image_server.create_store(settings), host, port)
+    except (OSError, TypeError, ValueError) as e:
+        click.echo(f"Error: Could not start the image server: {e}", err=True)
+        sys.exit(1)
+    click.echo(f"Serving uploads at {image_server.get_upload_url(server)}, press Ctrl+C to stop.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
 
 if __name__ == '__main__':
     cli()
@@ -14,6 +14,11 @@ setup(
         'pycryptodome',
         'mistune',
     ],
+    extras_require={
+        'images': ['Pillow'],
+        'watch': ['watchdog'],
+        'compress': ['Brotli'],
+    },
     entry_points={
         'console_scripts': [
             'blog-uploader = blog_uploader.main:cli',
@@ -0,0 +1,117 @@
+"""
+Shared fixtures: a throwaway HOME, local bare repositories standing in for the
+blog and secret remotes, and a fake `hugo` on PATH.
+"""
+import os
+import stat
+import subprocess
+import types
+
+import pytest
+from click.testing import CliRunner
+
+from blog_uploader import main
+
+FAKE_HUGO = """#!/bin/sh
+if [ "$1" = "new" ]; then
+    mkdir -p "content/$(dirname "$2")"
+    printf -- '---\\ntitle: "Untitled Post"\\n---\\n' > "content/$2"
+    exit 0
+fi
+if [ -n "$FAKE_HUGO_FAIL" ]; then echo "Error: build failed" >&2; exit 1; fi
+mkdir -p public
+echo '<p>home</p>' > public/index.html
+echo "Total in 1 ms"
+"""
+
+
+def git(*args, cwd=None):
+    return subprocess.run(["git", *args], cwd=cwd, check=True, capture_output=True, text=True).stdout.strip()
+
+
+def make_remote(path, files):
+    """Creates a bare repository at path whose main branch holds files."""
+    git("init", "-q", "--bare", "-b", "main", str(path))
+    work = path.parent / (path.name + "-seed")
+    git("clone", "-q", str(path), str(work))
+    for rel_path, content in files.items():
+        (work / rel_path).parent.mkdir(parents=True, exist_ok=True)
+        (work / rel_path).write_text(content, encoding="utf-8")
+    git("add", "-A", cwd=work)
+    git("commit", "-q", "-m", "Initial commit", cwd=work)
+    git("push", "-q", "origin", "HEAD:main", cwd=work)
+    return path
+
+
+def read_remote(remote, rel_path):
+    """Returns the content of rel_path on the remote's main branch, or None if it is missing."""
+    try:
+        return git("--git-dir", str(remote), "show", f"main:{rel_path}")
+    except subprocess.CalledProcessError:
+        return None
+
+
+@pytest.fixture(scope="session")
+def public_key_pem():
+    from Crypto.PublicKey import RSA
+
+    return RSA.generate(1024).publickey().export_key()
+
+
+@pytest.fixture
+def blog(tmp_path, monkeypatch, public_key_pem):
+    home = tmp_path / "home"
+    (home / ".blog_uploader").mkdir(parents=True)
+    monkeypatch.setenv("HOME", str(home))
+    for variable in ("GIT_AUTHOR_NAME", "GIT_COMMITTER_NAME"):
+        monkeypatch.setenv(variable, "Test")
+    for variable in ("GIT_AUTHOR_EMAIL", "GIT_COMMITTER_EMAIL"):
+        monkeypatch.setenv(variable, "test@example.com")
+
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    hugo = bin_dir / "hugo"
+    hugo.write_text(FAKE_HUGO)
+    hugo.chmod(hugo.stat().st_mode | stat.S_IEXEC)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+
+    main_remote = make_remote(tmp_path / "blog.git", {
+        "content/post/hello/index.md": '---\ntitle: "Hello"\n---\n\nHello.\n',
+        "netlify.toml": '[build]\n  publish = "public"\n',
+    })
+    secret_remote = make_remote(tmp_path / "secret.git", {"README.md": "Secrets.\n"})
+    monkeypatch.setattr(main, "REPO_URL", main_remote.as_uri())
+    monkeypatch.setattr(main, "SECRET_REPO_URL", secret_remote.as_uri())
+
+    # Module level caches must not leak between tests that each have their own HOME.
+    main.CONFIG_CACHE.clear()
+    main.PUBLISH_PLAN.update(active=False, paths=set())
+    main.SESSION_KEY_CACHE.clear()
+    main.PUBLIC_KEY_FINGERPRINTS.clear()
+    main.TRACE_SPANS.clear()
+    main.import_public_key.cache_clear()
+
+    key_path = tmp_path / "public.pem"
+    key_path.write_bytes(public_key_pem)
+    main.save_config({"public_key_path": str(key_path)})
+
+    def run(*args, input=None):
+        return CliRunner().invoke(main.cli, list(args), input=input)
+
+    def write_source(name, text):
+        path = tmp_path / "notes" / name
+        path.parent.mkdir(exist_ok=True)
+        path.write_text(text, encoding="utf-8")
+        return str(path)
+
+    return types.SimpleNamespace(
+        home=home,
+        main_remote=main_remote,
+        secret_remote=secret_remote,
+        temp_dir=home / ".blog_uploader" / main.TEMP_DIR_NAME,
+        secret_dir=home / ".blog_uploader" / main.SECRET_TEMP_DIR_NAME,
+        run=run,
+        write_source=write_source,
+        git=git,
+        read_remote=read_remote,
+    )
@@ -0,0 +1,29 @@
+"""Local builds: precompression is opt-in and the Netlify cache headers do not depend on the build output."""
+import os
+
+from blog_uploader import main
+
+
+def test_publish_leaves_netlify_toml_unchanged(blog):
+    for name in ("one.md", "two.md"):
+        result = blog.run("new", blog.write_source(name, f"{name}\n"), input="y\ny\n")
+        assert result.exit_code == 0, result.output
+    assert main.CACHE_HEADERS_BEGIN in blog.read_remote(blog.main_remote, "netlify.toml")
+    changed = blog.git("--git-dir", str(blog.main_remote), "diff", "--name-only", "main~1", "main").split()
+    assert "content/post/untitled-post/index.md" in changed
+    assert "netlify.toml" not in changed
+    assert not any(name.endswith(".gz") for name in os.listdir(blog.temp_dir / "public"))
+
+
+def test_cache_headers_are_path_patterns(tmp_path):
+    toml_path = tmp_path / "netlify.toml"
+    toml_path.write_text('[build]\n  publish = "public"\n', encoding="utf-8")
+    main.write_cache_headers(str(tmp_path), main.CACHE_HEADER_RULES)
+    first = toml_path.read_text(encoding="utf-8")
+    (tmp_path / "public" / "assets" / "css").mkdir(parents=True)
+    (tmp_path / "public" / "assets" / "css" / f"stylesheet.{'a' * 64}.css").write_text("a{}")
+    main.write_cache_headers(str(tmp_path), main.CACHE_HEADER_RULES)
+    assert toml_path.read_text(encoding="utf-8") == first
+    assert first.startswith('[build]\n  publish = "public"\n')
+    assert 'for = "/assets/css/*"' in first
+    assert 'for = "/search/*"' in first
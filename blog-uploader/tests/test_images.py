@@ -0,0 +1,37 @@
+"""Image optimization cache: failures are retried, "original" is only remembered for real results."""
+import json
+import os
+
+import pytest
+
+from blog_uploader import main
+
+pytest.importorskip("PIL")
+
+
+def read_cache():
+    with open(os.path.join(main.get_optimized_images_dir(), "index.json"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def test_failed_optimization_is_not_cached(blog, tmp_path):
+    from PIL import Image
+
+    broken = tmp_path / "broken.png"
+    broken.write_bytes(b"\x89PNG\r\n\x1a\nnot an image")
+    tiny = tmp_path / "tiny.png"
+    Image.new("RGB", (1, 1)).save(tiny, "PNG", optimize=True)
+    hashes = {str(broken): "a" * 64, str(tiny): "b" * 64}
+    # Without WebP, re-encoding cannot beat an already optimized PNG.
+    main.update_config(image_formats=[])
+
+    assert main.optimize_images(hashes) == {str(broken): str(broken), str(tiny): str(tiny)}
+    cache = read_cache()
+    assert not any(key.startswith("a" * 64) for key in cache)
+    assert [value for key, value in cache.items() if key.startswith("b" * 64)] == ["original"]
+
+    # Once the file can be read, it is optimized instead of being skipped as "original".
+    Image.new("RGB", (4000, 10)).save(broken, "PNG")
+    optimized = main.optimize_images(hashes)
+    assert optimized[str(broken)] != str(broken)
+    assert os.path.getsize(optimized[str(broken)]) < os.path.getsize(broken)
@@ -0,0 +1,52 @@
+"""Interrupted publishes: discarding a journal must leave nothing behind for the next publish."""
+import hashlib
+import json
+
+from blog_uploader import main
+
+
+def interrupt(*args, **kwargs):
+    raise KeyboardInterrupt
+
+
+def test_discard_then_new_publishes_only_the_new_post(blog, monkeypatch):
+    discarded = blog.write_source("discarded.md", "Discarded text with ~~a hidden span~~.\n")
+    with monkeypatch.context() as patch:
+        # Interrupt the run after the secret was written, while the draft is still in place.
+        patch.setattr(main, "sync_directory", interrupt)
+        result = blog.run("new", discarded, input="y\ny\n")
+    assert result.exit_code == 1
+    [journal] = main.load_journals()
+    assert main.next_journal_stage(journal) == "place"
+    title_hash = hashlib.sha256(b"Untitled Post").hexdigest()
+    assert (blog.secret_dir / f"{title_hash}.json").exists()
+
+    result = blog.run("resume", "--discard")
+    assert result.exit_code == 0, result.output
+    assert main.load_journals() == []
+    assert not (blog.temp_dir / "content" / "post" / f"{main.DRAFT_DIR_NAME}-{journal['id']}").exists()
+    assert blog.git("status", "--porcelain", cwd=blog.secret_dir) == ""
+
+    kept = blog.write_source("kept.md", "Kept text.\n")
+    result = blog.run("new", kept, input="y\n")
+    assert result.exit_code == 0, result.output
+    post = blog.read_remote(blog.main_remote, "content/post/untitled-post/index.md")
+    assert "Kept text." in post
+    assert "Discarded" not in post
+    assert blog.read_remote(blog.secret_remote, f"{title_hash}.json") is None
+    manifest = blog.read_remote(blog.secret_remote, main.SECRET_MANIFEST_NAME)
+    assert manifest is None or title_hash not in json.loads(manifest)["posts"]
+
+
+def test_new_does_not_reopen_a_draft_of_another_run(blog):
+    stale = blog.temp_dir / "content" / "post" / main.DRAFT_DIR_NAME
+    result = blog.run("new", blog.write_source("first.md", "First.\n"), input="y\n")
+    assert result.exit_code == 0, result.output
+    stale.mkdir(parents=True, exist_ok=True)
+    (stale / "index.md").write_text('---\ntitle: "Stale"\n---\nStale draft.\n', encoding="utf-8")
+
+    result = blog.run("new", blog.write_source("second.md", "Second.\n"), input="y\ny\n")
+    assert result.exit_code == 0, result.output
+    post = blog.read_remote(blog.main_remote, "content/post/untitled-post/index.md")
+    assert "Second." in post
+    assert "Stale draft." not in post
@@ -0,0 +1,120 @@
+"""Link checking against a local http.server on 127.0.0.1."""
+import http.server
+import threading
+import time
+
+import pytest
+
+from blog_uploader import main
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    active = {}
+    peak = {}
+    statuses = []
+    lock = threading.Lock()
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def respond(self, status, headers=()):
+        self.statuses.append((self.command, self.path, status))
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_HEAD(self):
+        self.route(head=True)
+
+    def do_GET(self):
+        self.route(head=False)
+
+    def route(self, head):
+        host = self.headers["Host"].split(":")[0]
+        if self.path.startswith("/slow"):
+            with self.lock:
+                self.active[host] = self.active.get(host, 0) + 1
+                self.peak[host] = max(self.peak.get(host, 0), self.active[host])
+            time.sleep(0.1)
+            with self.lock:
+                self.active[host] -= 1
+            self.respond(200)
+        elif self.path == "/no-head":
+            self.respond(405 if head else 200)
+        elif self.path == "/moved":
+            self.respond(301, [("Location", "/ok")])
+        elif self.path == "/moved-away":
+            self.respond(302, [("Location", "/missing")])
+        elif self.path == "/ok":
+            self.respond(200)
+        elif self.path == "/hang":
+            time.sleep(1)
+            self.respond(200)
+        elif self.path == "/tagged":
+            if self.headers.get("If-None-Match") == '"v1"':
+                self.respond(304, [("ETag", '"v1"')])
+            else:
+                self.respond(200, [("ETag", '"v1"')])
+        else:
+            self.respond(404)
+
+
+@pytest.fixture
+def server(tmp_path, monkeypatch):
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setenv("NO_PROXY", "127.0.0.1,localhost")
+    main.CONFIG_CACHE.clear()
+    Handler.active.clear()
+    Handler.peak.clear()
+    Handler.statuses.clear()
+    httpd = http.server.ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    httpd.daemon_threads = True
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd.server_address[1]
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_requests_per_host_are_limited(server):
+    urls = [f"http://{host}:{server}/slow/{i}" for host in ("127.0.0.1", "localhost") for i in range(8)]
+    results = main.check_links(urls, concurrency=8, per_host=2)
+    assert all(result["ok"] for result in results.values())
+    assert Handler.peak == {"127.0.0.1": 2, "localhost": 2}
+
+
+def test_get_is_tried_when_head_is_refused(server):
+    url = f"http://127.0.0.1:{server}"
+    results = main.check_links([f"{url}/no-head", f"{url}/missing"])
+    assert results[f"{url}/no-head"]["ok"] and results[f"{url}/no-head"]["status"] == 200
+    assert ("GET", "/no-head", 200) in Handler.statuses
+    assert not results[f"{url}/missing"]["ok"] and results[f"{url}/missing"]["status"] == 404
+
+
+def test_redirects_are_followed(server):
+    url = f"http://127.0.0.1:{server}"
+    results = main.check_links([f"{url}/moved", f"{url}/moved-away"])
+    assert results[f"{url}/moved"]["status"] == 200
+    assert results[f"{url}/moved-away"]["status"] == 404
+
+
+def test_slow_servers_time_out(server):
+    url = f"http://127.0.0.1:{server}/hang"
+    result = main.check_links([url], timeout=0.3)[url]
+    assert not result["ok"]
+    assert result["status"] is None and result["error"] == "ReadTimeout"
+    assert result["elapsed"] < 0.9
+
+
+def test_cached_results_are_reused_and_revalidated(server):
+    url = f"http://127.0.0.1:{server}/tagged"
+    first = main.check_links([url])[url]
+    assert first["ok"] and first["etag"] == '"v1"'
+    assert main.check_links([url])[url]["cached"]
+    # Past the TTL the URL is requested again, and the 304 keeps the stored result.
+    revalidated = main.check_links([url], ttl=0)[url]
+    assert revalidated["ok"] and revalidated["status"] == 200 and "cached" not in revalidated
+    assert Handler.statuses == [("HEAD", "/tagged", 200), ("HEAD", "/tagged", 304)]
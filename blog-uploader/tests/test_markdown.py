@@ -0,0 +1,58 @@
+"""Regression cases for the markdown tokenizer behind image rewriting and secret extraction."""
+import pytest
+
+from blog_uploader.main import process_strikethrough_content, tokenize_markdown
+
+
+def secrets_of(content):
+    _, secrets = process_strikethrough_content("t", content, confirm=False)
+    return sorted(secrets.values()) if secrets else []
+
+
+def code_of(content):
+    return [token[1] for token in tokenize_markdown(content) if token[0] == "code"]
+
+
+def test_tokens_round_trip():
+    content = "> ```\n> ~~a~~\n\n- item\n\n      code\n\ntext ~~b~~ `c`\n```py```\n"
+    assert "".join(token[1] for token in tokenize_markdown(content)) == content
+
+
+@pytest.mark.parametrize("content", [
+    "```py```\n~~secret~~\n",
+    "``` a`b\n~~secret~~\n",
+    "text\n    ~~secret~~\n",
+    "- item\n\n    ~~secret~~\n",
+    "- item\nlazy continuation\n\n    ~~secret~~\n",
+    "> ```\n> code\n\n~~secret~~\n",
+    "- ```\n  code\n\n~~secret~~\n",
+])
+def test_secrets_outside_code_are_extracted(content):
+    assert secrets_of(content) == ["~~secret~~"]
+
+
+@pytest.mark.parametrize("content", [
+    "```\n~~x~~\n```\n",
+    "~~~\n~~x~~\n~~~\n",
+    "```\n~~x~~\n",
+    "    ~~x~~\n",
+    "text\n\n    ~~x~~\n",
+    "\t~~x~~\n",
+    "> ```\n> ~~x~~\n> ```\n",
+    ">     ~~x~~\n",
+    "- item\n\n  ```\n  ~~x~~\n  ```\n",
+    "1. ```\n   ~~x~~\n   ```\n",
+    "- item\n\n      ~~x~~\n",
+    "`~~x~~`\n",
+])
+def test_secrets_inside_code_are_kept(content):
+    assert secrets_of(content) == []
+    assert any("~~x~~" in code for code in code_of(content))
+
+
+def test_fence_ends_with_its_blockquote():
+    assert code_of("> ```\n> a\nb ~~c~~\n") == ["> ```\n> a\n"]
+
+
+def test_fence_closes_only_with_a_long_enough_run():
+    assert secrets_of("````\n```\n~~x~~\n````\n~~secret~~\n") == ["~~secret~~"]
@@ -0,0 +1,78 @@
+"""Publishing to both repositories when one of the pushes is rejected."""
+import hashlib
+import stat
+
+from blog_uploader import main
+
+SECRET_HASH = hashlib.sha256(b"Untitled Post").hexdigest()
+POST_PATH = "content/post/untitled-post/index.md"
+
+
+def reject_pushes(remote):
+    hook = remote / "hooks" / "pre-receive"
+    hook.write_text("#!/bin/sh\necho rejected >&2\nexit 1\n")
+    hook.chmod(hook.stat().st_mode | stat.S_IEXEC)
+    return hook
+
+
+def head(blog, path, ref="HEAD"):
+    return blog.git("rev-parse", ref, cwd=path)
+
+
+def test_secret_pushed_before_failed_post_is_reverted(blog):
+    hook = reject_pushes(blog.main_remote)
+    source = blog.write_source("post.md", "Text with ~~a secret~~.\n")
+    result = blog.run("new", source, input="y\ny\n")
+    assert result.exit_code == 1
+    assert "The secret commit has been rolled back." in result.output
+
+    # The secret went out and was reverted right away.
+    log = blog.git("--git-dir", str(blog.secret_remote), "log", "--format=%s", "main").splitlines()
+    assert log[0].startswith("Revert ") and log[1] == "Add secret for post: Untitled Post"
+    assert blog.read_remote(blog.secret_remote, f"{SECRET_HASH}.json") is None
+    # The post commit is gone, so a later push from the checkout cannot publish it.
+    assert head(blog, blog.temp_dir) == head(blog, blog.temp_dir, "@{u}")
+    assert not (blog.temp_dir / POST_PATH).exists()
+
+    hook.unlink()
+    result = blog.run("remove", "hello", input="y\n")
+    assert result.exit_code == 0, result.output
+    assert blog.read_remote(blog.main_remote, POST_PATH) is None
+    assert blog.read_remote(blog.main_remote, "content/post/hello/index.md") is None
+
+    # The journal still publishes the post and its secret once the remote accepts it.
+    [journal] = main.load_journals()
+    assert main.next_journal_stage(journal) == "commit"
+    result = blog.run("resume")
+    assert result.exit_code == 0, result.output
+    assert "a secret" not in blog.read_remote(blog.main_remote, POST_PATH)
+    assert blog.read_remote(blog.secret_remote, f"{SECRET_HASH}.json") is not None
+
+
+def test_unpushed_secret_is_reset_with_failed_post(blog):
+    reject_pushes(blog.main_remote)
+    reject_pushes(blog.secret_remote)
+    main_remote_head = blog.git("--git-dir", str(blog.main_remote), "rev-parse", "main")
+    secret_remote_head = blog.git("--git-dir", str(blog.secret_remote), "rev-parse", "main")
+    source = blog.write_source("post.md", "Text with ~~a secret~~.\n")
+    result = blog.run("new", source, input="y\ny\n")
+    assert result.exit_code == 1
+
+    assert blog.git("--git-dir", str(blog.main_remote), "rev-parse", "main") == main_remote_head
+    assert blog.git("--git-dir", str(blog.secret_remote), "rev-parse", "main") == secret_remote_head
+    assert head(blog, blog.temp_dir) == main_remote_head
+    assert head(blog, blog.secret_dir) == secret_remote_head
+    assert not (blog.secret_dir / f"{SECRET_HASH}.json").exists()
+
+
+def test_remove_deletes_the_secrets_of_the_post(blog):
+    result = blog.run("new", blog.write_source("post.md", "Text with ~~a secret~~.\n"), input="y\ny\n")
+    assert result.exit_code == 0, result.output
+    assert SECRET_HASH in blog.read_remote(blog.secret_remote, main.SECRET_MANIFEST_NAME)
+
+    result = blog.run("remove", "untitled-post", input="y\n")
+    assert result.exit_code == 0, result.output
+    assert blog.read_remote(blog.main_remote, POST_PATH) is None
+    assert blog.read_remote(blog.secret_remote, f"{SECRET_HASH}.json") is None
+    assert SECRET_HASH not in blog.read_remote(blog.secret_remote, main.SECRET_MANIFEST_NAME)
+    assert blog.git("status", "--porcelain", cwd=blog.secret_dir) == ""
@@ -0,0 +1,67 @@
+"""
+Startup budget for short commands, measured with `python -X importtime`.
+
+The budgets are the total import time in milliseconds (without the
+interpreter's own `site` import) and can be raised on slow machines with
+BLOG_UPLOADER_HELP_BUDGET_MS and BLOG_UPLOADER_LIST_BUDGET_MS.
+"""
+import os
+import subprocess
+import sys
+
+import pytest
+
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HELP_BUDGET_MS = float(os.environ.get("BLOG_UPLOADER_HELP_BUDGET_MS", 150))
+LIST_BUDGET_MS = float(os.environ.get("BLOG_UPLOADER_LIST_BUDGET_MS", 300))
+# Loaded lazily by the commands that need them; `--help` must not pay for any of them.
+HEAVY_MODULES = {"git", "requests", "frontmatter", "Crypto", "rich", "slugify", "mistune"}
+RUNS = 3
+
+
+def run_cli(args, home):
+    """Runs the CLI in a fresh interpreter and returns ({top-level module: µs}, total ms)."""
+    code = f"import sys; sys.argv = ['blog-uploader'] + {args!r}; from blog_uploader.main import cli; cli()"
+    env = dict(os.environ, HOME=str(home), PYTHONPATH=PACKAGE_DIR)
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True, env=env, cwd=PACKAGE_DIR
+    )
+    assert result.returncode == 0, result.stdout + result.stderr
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        # Only top-level imports, so nested ones are not counted twice. `site` is the
+        # interpreter's own startup and depends on what else is installed.
+        if cumulative.strip().isdigit() and not name.startswith("  ") and name.strip() != "site":
+            modules[name.strip()] = int(cumulative)
+    return modules, sum(modules.values()) / 1000
+
+
+def fastest_run(args, home):
+    """Returns the run with the lowest total import time, to keep noise out of the budget."""
+    return min((run_cli(args, home) for _ in range(RUNS)), key=lambda run: run[1])
+
+
+@pytest.fixture
+def site_home(tmp_path):
+    post_dir = tmp_path / ".blog_uploader" / "temp_blog" / "content" / "post" / "hello"
+    post_dir.mkdir(parents=True)
+    (post_dir / "index.md").write_text('---\ntitle: "Hello"\ndate: 2025-01-01\n---\n\nHello world.\n', encoding="utf-8")
+    return tmp_path
+
+
+def test_help_imports_no_heavy_dependencies(tmp_path):
+    modules, _ = run_cli(["--help"], tmp_path)
+    assert not {name.split(".")[0] for name in modules} & HEAVY_MODULES
+
+
+def test_help_startup_within_budget(tmp_path):
+    _, total_ms = fastest_run(["--help"], tmp_path)
+    assert total_ms <= HELP_BUDGET_MS, f"--help spent {total_ms:.0f} ms importing (budget {HELP_BUDGET_MS:.0f} ms)"
+
+
+def test_list_startup_within_budget(site_home):
+    _, total_ms = fastest_run(["--offline", "list"], site_home)
+    assert total_ms <= LIST_BUDGET_MS, f"list spent {total_ms:.0f} ms importing (budget {LIST_BUDGET_MS:.0f} ms)"
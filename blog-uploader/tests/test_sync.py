@@ -0,0 +1,69 @@
+"""Cloning and syncing the checkouts against local bare repositories."""
+from blog_uploader import main
+
+
+def push_commit(blog, tmp_path, rel_path, content):
+    """Commits a change to the blog remote from another clone and returns the new remote HEAD."""
+    work = tmp_path / "elsewhere"
+    if not work.exists():
+        blog.git("clone", "-q", str(blog.main_remote), str(work))
+    (work / rel_path).parent.mkdir(parents=True, exist_ok=True)
+    (work / rel_path).write_text(content, encoding="utf-8")
+    blog.git("add", "-A", cwd=work)
+    blog.git("commit", "-q", "-m", f"Change {rel_path}", cwd=work)
+    blog.git("push", "-q", "origin", "HEAD:main", cwd=work)
+    return blog.git("rev-parse", "HEAD", cwd=work)
+
+
+def test_partial_clone_fetches_old_blobs_on_demand(blog, tmp_path):
+    blog.git("config", "uploadpack.allowFilter", "true", cwd=blog.main_remote)
+    push_commit(blog, tmp_path, "static/image.png", "old image")
+    push_commit(blog, tmp_path, "static/image.png", "new image")
+
+    assert blog.run("list").exit_code == 0
+    assert blog.git("config", "remote.origin.partialclonefilter", cwd=blog.temp_dir) == "blob:none"
+    missing = blog.git("rev-list", "--objects", "--missing=print", "HEAD", cwd=blog.temp_dir).splitlines()
+    # Only the blob of the old image revision is left on the remote.
+    assert len([line for line in missing if line.startswith("?")]) == 1
+    assert (blog.temp_dir / "static" / "image.png").read_text() == "new image"
+
+
+def test_shallow_clone(blog, tmp_path):
+    push_commit(blog, tmp_path, "static/image.png", "old image")
+    main.update_config(clone_mode="shallow")
+    assert blog.run("list").exit_code == 0
+    assert blog.git("rev-parse", "--is-shallow-repository", cwd=blog.temp_dir) == "true"
+    assert blog.git("rev-list", "--count", "HEAD", cwd=blog.temp_dir) == "1"
+
+
+def test_read_only_commands_skip_the_remote_within_the_ttl(blog, tmp_path):
+    assert blog.run("list").exit_code == 0
+    cloned_head = blog.git("rev-parse", "HEAD", cwd=blog.temp_dir)
+    remote_head = push_commit(blog, tmp_path, "content/post/new/index.md", '---\ntitle: "New"\n---\n')
+
+    result = blog.run("list")
+    assert "skipping pull" in result.output
+    assert blog.git("rev-parse", "HEAD", cwd=blog.temp_dir) == cloned_head
+
+    result = blog.run("--sync-ttl", "0", "list")
+    assert result.exit_code == 0, result.output
+    assert "Pulling latest changes" in result.output
+    assert blog.git("rev-parse", "HEAD", cwd=blog.temp_dir) == remote_head
+
+
+def test_offline_never_contacts_the_remote(blog, tmp_path):
+    result = blog.run("--offline", "list")
+    assert result.exit_code == 1
+    assert "has not been cloned yet and --offline was given" in result.output
+    assert not blog.temp_dir.exists()
+
+    assert blog.run("list").exit_code == 0
+    cloned_head = blog.git("rev-parse", "HEAD", cwd=blog.temp_dir)
+    push_commit(blog, tmp_path, "content/post/new/index.md", '---\ntitle: "New"\n---\n')
+    # With the remote gone, anything that fetched would fail.
+    blog.main_remote.rename(tmp_path / "moved.git")
+
+    result = blog.run("--offline", "--sync-ttl", "0", "list")
+    assert result.exit_code == 0, result.output
+    assert "Offline mode: using the local copy" in result.output
+    assert blog.git("rev-parse", "HEAD", cwd=blog.temp_dir) == cloned_head
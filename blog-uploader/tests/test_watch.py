@@ -0,0 +1,24 @@
+"""The watcher must survive a failed publish and retry the same sources."""
+from blog_uploader import main
+
+
+def test_watch_survives_a_failed_build(blog, monkeypatch):
+    notes = blog.home.parent / "notes"
+    source = blog.write_source("note.md", "A note.\n")
+    attempts = []
+
+    def changes(directory, tick):
+        monkeypatch.setenv("FAKE_HUGO_FAIL", "1")
+        yield {source}
+        attempts.append(blog.git("status", "--porcelain", cwd=blog.temp_dir))
+        monkeypatch.delenv("FAKE_HUGO_FAIL")
+        yield set()
+        raise KeyboardInterrupt
+
+    monkeypatch.setattr(main, "iter_source_changes", changes)
+    result = blog.run("watch", str(notes), "--debounce", "0", "--commit-interval", "0", input="n\n")
+    assert result.exit_code == 0, result.output
+    assert "sources will be published again" in result.output
+    # The failed build left nothing behind that could block the next pull.
+    assert attempts == [""]
+    assert "A note." in blog.read_remote(blog.main_remote, "content/post/note/index.md")